@@ -0,0 +1,75 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from certificates.models import PooledKeyPair
+from certificates.utils import generate_key_pair
+from documents import crypto
+
+
+class Command(BaseCommand):
+    help = (
+        "Complète le pool de paires de clés RSA pré-générées jusqu'à CERTIFICATE_KEY_POOL_SIZE. "
+        "Avec --loop, reste actif et complète le pool dès qu'il passe sous le seuil."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=getattr(settings, 'CERTIFICATE_KEY_POOL_SIZE', 50),
+                            help='Nombre de paires à maintenir dans le pool')
+        parser.add_argument('--low-watermark', type=int, default=None,
+                            help='Avec --loop, complète le pool quand il descend sous ce seuil (par défaut : --size)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Processus de génération (0 : dans le processus courant)')
+        parser.add_argument('--loop', action='store_true',
+                            help='Reste actif et surveille le pool')
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='Avec --loop, délai en secondes entre deux vérifications')
+
+    def handle(self, *args, **options):
+        size = options['size']
+        low_watermark = options['low_watermark'] if options['low_watermark'] is not None else size
+        executor = None
+        if options['workers'] > 0:
+            # Même choix de démarrage que le pool PDF (documents/pdf_pool.py)
+            context = multiprocessing.get_context(
+                'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            )
+            executor = ProcessPoolExecutor(max_workers=options['workers'], mp_context=context)
+
+        try:
+            while True:
+                close_old_connections()
+                available = PooledKeyPair.objects.count()
+                if available < low_watermark:
+                    self.refill(executor, size - available)
+                elif not options['loop']:
+                    self.stdout.write(f'{available} paire(s) disponible(s), pool complet')
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if executor:
+                executor.shutdown(cancel_futures=True)
+
+    def refill(self, executor, missing):
+        started = time.monotonic()
+        if executor:
+            # generate_key_pair est importée par les processus sans charger les modèles Django
+            pairs = (future.result() for future in [executor.submit(generate_key_pair) for _ in range(missing)])
+        else:
+            pairs = (generate_key_pair() for _ in range(missing))
+        PooledKeyPair.objects.bulk_create([
+            PooledKeyPair(public_key=public_key, private_key=crypto.encrypt(private_key))
+            for public_key, private_key in pairs
+        ])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'{missing} paire(s) de clés ajoutée(s) au pool en {elapsed:.1f} s'
+        ))
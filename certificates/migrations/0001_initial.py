@@ -0,0 +1,36 @@
+# Generated by Django 5.0.3 on 2026-10-17 01:35
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Certificate',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('public_key', models.TextField()),
+                ('private_key', models.TextField()),
+                ('valid_from', models.DateTimeField(auto_now_add=True)),
+                ('valid_until', models.DateTimeField()),
+                ('status', models.CharField(choices=[('active', 'Active'), ('revoked', 'Revoked'), ('expired', 'Expired')], default='active', max_length=20)),
+                ('revocation_reason', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PooledKeyPair',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('public_key', models.TextField()),
+                ('private_key', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -1,6 +1,11 @@
 from django.db import models
 import uuid
 from users.models import User
+from documents import crypto
+import logging
+
+# Configurer le logger
+logger = logging.getLogger(__name__)
 
 class Certificate(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -22,3 +27,38 @@ class Certificate(models.Model):
     def __str__(self):
         return f"Certificate for {self.user.email}"
     
+
+
+class PooledKeyPair(models.Model):
+    """
+    Paire de clés RSA générée à l'avance (commande refill_key_pool)
+
+    La génération d'une clé RSA 2048 bits coûte des dizaines à des centaines de
+    millisecondes : la création d'un certificat prend une paire prête dans le pool.
+    La clé privée y reste chiffrée (documents.crypto) jusqu'à son attribution.
+    """
+    public_key = models.TextField()
+    private_key = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    @classmethod
+    def take(cls):
+        """
+        Retire la plus ancienne paire du pool
+
+        Le retrait est une suppression conditionnelle : si plusieurs requêtes
+        lisent la même paire, une seule d'entre elles la supprime et l'obtient.
+
+        Returns:
+            tuple | None: (clé publique PEM, clé privée PEM), None si le pool est vide
+        """
+        for pair in cls.objects.order_by('id')[:5]:
+            deleted, _ = cls.objects.filter(id=pair.id).delete()
+            if not deleted:
+                continue
+            try:
+                return pair.public_key, crypto.decrypt(pair.private_key)
+            except crypto.InvalidToken:
+                # Clé de chiffrement changée depuis la génération : la paire est perdue
+                logger.error(f"Paire de clés {pair.id} du pool indéchiffrable, ignorée")
+        return None
@@ -1,6 +1,10 @@
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives.asymmetric import rsa
 from cryptography.hazmat.primitives import hashes
+import logging
+
+# Configurer le logger
+logger = logging.getLogger(__name__)
 
 def generate_key_pair():
     """Generate RSA key pair for digital signatures."""
@@ -22,4 +26,17 @@ def generate_key_pair():
         format=serialization.PublicFormat.SubjectPublicKeyInfo
     )
     
-    return public_pem.decode(), private_pem.decode()
\ No newline at end of file
+    return public_pem.decode(), private_pem.decode()
+
+
+def take_key_pair():
+    """
+    Paire de clés pour un nouveau certificat : prise dans le pool pré-généré
+    (PooledKeyPair), ou générée immédiatement si le pool est vide.
+    """
+    from .models import PooledKeyPair
+    pair = PooledKeyPair.take()
+    if pair is None:
+        logger.warning("Pool de clés RSA vide, génération immédiate (lancer refill_key_pool)")
+        return generate_key_pair()
+    return pair
@@ -4,11 +4,12 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from core.fieldsets import SparseFieldsetViewMixin
 from .models import Certificate
 from .serializers import CertificateSerializer
-from .utils import generate_key_pair
+from .utils import take_key_pair
 
-class CertificateViewSet(viewsets.ModelViewSet):
+class CertificateViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     serializer_class = CertificateSerializer
     permission_classes = [IsAuthenticated]
 
@@ -17,7 +18,6 @@ class CertificateViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['post'])
     def generate(self, request):
-        public_key, private_key = generate_key_pair()
         valid_until = request.data.get('valid_until')
 
         if not valid_until:
@@ -37,6 +37,8 @@ class CertificateViewSet(viewsets.ModelViewSet):
         if valid_until <= now():
             return Response({'error': '`valid_until` doit être dans le futur.'}, status=status.HTTP_400_BAD_REQUEST)
         
+        # Paire de clés du pool pré-généré (génération seulement après validation)
+        public_key, private_key = take_key_pair()
         certificate = Certificate.objects.create(
             user=request.user,
             public_key=public_key,
@@ -0,0 +1,213 @@
+"""
+Sélection des champs renvoyés par l'API : ?fields= et ?expand=.
+
+- ?fields=id,title,document.title : champs retenus ; la notation pointée restreint
+  les champs d'une relation imbriquée (et la développe).
+- ?expand=document : relations imbriquées développées. Quand ?fields est utilisé,
+  une relation retenue mais non développée est renvoyée par son identifiant.
+
+Sans ?fields, la représentation complète est inchangée.
+
+Côté base de données, la même sélection pilote only(), select_related() et
+prefetch_related() : les colonnes et jointures non demandées ne sont pas chargées.
+Les champs calculés (SerializerMethodField, propriétés) déclarent leurs besoins dans
+Meta.fieldset_hints = {'champ': {'columns': [...], 'select_related': [...],
+'prefetch': [...]}} ; un champ
+calculé sans indication désactive only() à son niveau (toutes les colonnes sont
+alors chargées, par sécurité).
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+def parse_fieldset(value):
+    """
+    Convertit 'a,b.c,b.d' en {'a': {}, 'b': {'c': {}, 'd': {}}}
+
+    Returns:
+        dict | None: None si le paramètre est absent ou vide
+    """
+    if not value:
+        return None
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for name in filter(None, (part.strip() for part in path.split('.'))):
+            node = node.setdefault(name, {})
+    return tree or None
+
+
+class SparseFieldsetSerializerMixin:
+    """Mixin de ModelSerializer qui accepte les arguments fieldset et expand"""
+
+    def __init__(self, *args, **kwargs):
+        fieldset = kwargs.pop('fieldset', None)
+        expand = kwargs.pop('expand', None)
+        super().__init__(*args, **kwargs)
+        if fieldset is not None or expand:
+            self.apply_fieldset(fieldset, expand or {})
+
+    def apply_fieldset(self, fieldset, expand):
+        """Retire les champs non demandés et replie les relations non développées"""
+        if fieldset is not None:
+            for name in list(self.fields):
+                if name not in fieldset:
+                    self.fields.pop(name)
+
+        for name, field in list(self.fields.items()):
+            many = isinstance(field, serializers.ListSerializer)
+            nested = field.child if many else field
+            if not isinstance(nested, serializers.BaseSerializer):
+                continue
+            sub_fieldset = fieldset.get(name) if fieldset else None
+            if fieldset is not None and name not in expand and not sub_fieldset:
+                self.fields[name] = _collapsed_field(self.Meta.model, field, many)
+            elif isinstance(nested, SparseFieldsetSerializerMixin):
+                if sub_fieldset or expand.get(name):
+                    nested.apply_fieldset(sub_fieldset or None, expand.get(name) or {})
+
+
+def _collapsed_field(model, field, many):
+    """Champ qui renvoie l'identifiant de la relation au lieu de l'objet imbriqué"""
+    if many:
+        return serializers.PrimaryKeyRelatedField(source=field.source, many=True, read_only=True)
+    try:
+        model_field = model._meta.get_field(field.source)
+    except FieldDoesNotExist:
+        model_field = None
+    if model_field is not None and model_field.concrete and model_field.many_to_one:
+        # Colonne de clé étrangère : aucune requête sur la table liée
+        return serializers.ReadOnlyField(source=model_field.attname)
+    return serializers.PrimaryKeyRelatedField(source=field.source, read_only=True)
+
+
+def queryset_plan(serializer, model, prefix=''):
+    """
+    Colonnes, jointures et préchargements nécessaires à un sérialiseur
+
+    Returns:
+        tuple(set, set, list, bool): colonnes pour only(), select_related,
+            prefetch_related, et False si only() ne peut pas être appliqué
+    """
+    columns = {prefix + model._meta.pk.name}
+    joins = set()
+    prefetches = []
+    complete = True
+    hints = getattr(getattr(serializer, 'Meta', None), 'fieldset_hints', {})
+
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if name in hints:
+            columns.update(prefix + column for column in hints[name].get('columns', []))
+            joins.update(prefix + join for join in hints[name].get('select_related', []))
+            for lookup in hints[name].get('prefetch', []):
+                if callable(lookup):
+                    lookup = lookup()
+                if isinstance(lookup, Prefetch):
+                    prefetches.append(Prefetch(prefix + lookup.prefetch_through, queryset=lookup.queryset))
+                else:
+                    prefetches.append(prefix + lookup)
+            continue
+
+        source = field.source
+        try:
+            model_field = model._meta.get_field(source)
+        except FieldDoesNotExist:
+            complete = False
+            continue
+
+        many = isinstance(field, serializers.ListSerializer)
+        nested = field.child if many else field
+        if model_field.concrete and (model_field.many_to_one or model_field.one_to_one):
+            columns.add(prefix + model_field.name)
+            if isinstance(nested, serializers.BaseSerializer):
+                related_model = model_field.related_model
+                path = prefix + model_field.name
+                joins.add(path)
+                sub_columns, sub_joins, sub_prefetches, sub_complete = queryset_plan(nested, related_model, path + '__')
+                joins.update(sub_joins)
+                prefetches.extend(sub_prefetches)
+                if sub_complete:
+                    columns.update(sub_columns)
+                else:
+                    columns.update(
+                        f'{path}__{related_field.name}' for related_field in related_model._meta.concrete_fields
+                    )
+        elif model_field.many_to_many or model_field.one_to_many:
+            if isinstance(nested, serializers.BaseSerializer):
+                # Les objets liés sont eux-mêmes restreints à ce que le sérialiseur imbriqué affiche
+                related_model = model_field.related_model
+                related_queryset = apply_plan(
+                    related_model._default_manager.all(), *queryset_plan(nested, related_model),
+                    required=[model_field.field.name] if model_field.one_to_many else [],
+                )
+                prefetches.append(Prefetch(prefix + source, queryset=related_queryset))
+            else:
+                prefetches.append(prefix + source)
+        elif model_field.concrete:
+            columns.add(prefix + model_field.name)
+        else:
+            complete = False
+
+    return columns, joins, prefetches, complete
+
+
+def apply_plan(queryset, columns, joins, prefetches, complete, required=()):
+    """Applique au queryset le résultat de queryset_plan"""
+    if joins:
+        queryset = queryset.select_related(*joins)
+    if prefetches:
+        # Une même relation peut être demandée par plusieurs champs
+        unique = {}
+        for lookup in prefetches:
+            key = lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup
+            unique.setdefault(key, lookup)
+        queryset = queryset.prefetch_related(*unique.values())
+    if complete:
+        queryset = queryset.only(*columns, *required)
+    return queryset
+
+
+class SparseFieldsetViewMixin:
+    """
+    Mixin de ViewSet : transmet ?fields / ?expand au sérialiseur et restreint le
+    queryset de list et retrieve aux colonnes et relations demandées
+    """
+    fieldset_actions = ('list', 'retrieve')
+
+    def get_fieldset(self):
+        request = getattr(self, 'request', None)
+        if request is None or request.method != 'GET' or self.action not in self.fieldset_actions:
+            return None, None
+        return parse_fieldset(request.query_params.get('fields')), parse_fieldset(request.query_params.get('expand'))
+
+    def get_serializer(self, *args, **kwargs):
+        fieldset, expand = self.get_fieldset()
+        if fieldset is not None or expand:
+            kwargs.setdefault('fieldset', fieldset)
+            kwargs.setdefault('expand', expand)
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fieldset, expand = self.get_fieldset()
+        if fieldset is None:
+            return queryset
+
+        serializer_class = self.get_serializer_class()
+        if not issubclass(serializer_class, SparseFieldsetSerializerMixin):
+            return queryset
+        serializer = serializer_class(fieldset=fieldset, expand=expand, context=self.get_serializer_context())
+        columns, joins, prefetches, complete = queryset_plan(serializer, queryset.model)
+
+        # Les champs d'ordre de la pagination par curseur sont lus sur les objets
+        ordering = getattr(self.pagination_class, 'ordering', None) or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        # Le plan remplace les préchargements par défaut du ViewSet
+        return apply_plan(
+            queryset.select_related(None).prefetch_related(None), columns, joins, prefetches, complete,
+            required=[field.lstrip('-') for field in ordering],
+        )
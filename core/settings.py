@@ -218,6 +218,25 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Le SHA-256 des fichiers est calculé pendant la réception (voir documents/upload_handlers.py)
+FILE_UPLOAD_HANDLERS = [
+    'documents.upload_handlers.HashingMemoryFileUploadHandler',
+    'documents.upload_handlers.HashingTemporaryFileUploadHandler',
+]
+
+# Fichiers des documents stockés sous blobs/<sha256> (voir documents/storage.py)
+DOCUMENT_STORAGE_CONTENT_ADDRESSED = env.bool('DOCUMENT_STORAGE_CONTENT_ADDRESSED', default=True)
+
+# Livraison des documents téléchargés (voir documents/downloads.py) :
+# - 'django' : Django envoie le fichier en streaming
+# - 'nginx' : Django vérifie les droits puis délègue l'envoi à nginx via X-Accel-Redirect
+DOCUMENT_DELIVERY = env('DOCUMENT_DELIVERY', default='django')
+# Location nginx "internal" qui pointe sur MEDIA_ROOT
+DOCUMENT_ACCEL_PREFIX = env('DOCUMENT_ACCEL_PREFIX', default='/protected-media/')
+# Servir /media/ par Django hors DEBUG : sans contrôle d'accès, à n'activer que si MEDIA_ROOT
+# ne contient rien de privé (les documents passent par /api/documents/<id>/download_document/)
+SERVE_MEDIA_WITH_DJANGO = env.bool('SERVE_MEDIA_WITH_DJANGO', default=False)
+
 # S'assurer que les répertoires existent
 os.makedirs(STATIC_ROOT, exist_ok=True)
 os.makedirs(MEDIA_ROOT, exist_ok=True)
@@ -276,6 +295,10 @@ if SIGNATURE_ENCRYPTION_KEY:
     # Nettoyer la clé (supprimer les espaces)
     SIGNATURE_ENCRYPTION_KEY = SIGNATURE_ENCRYPTION_KEY.strip()
 
+# Anciennes clés acceptées en déchiffrement pendant une rotation (séparées par des virgules),
+# à retirer après `python manage.py rotate_signature_key`
+SIGNATURE_ENCRYPTION_OLD_KEYS = [key.strip() for key in env.list('SIGNATURE_ENCRYPTION_OLD_KEYS', default=[]) if key.strip()]
+
 # Si la clé n'est pas définie ou n'est pas au format attendu, générer une nouvelle clé
 try:
     if SIGNATURE_ENCRYPTION_KEY:
@@ -288,6 +311,58 @@ except Exception as e:
     logger.warning(f"ATTENTION: La clé de chiffrement n'est pas valide ({str(e)}). Génération d'une nouvelle clé temporaire.")
     SIGNATURE_ENCRYPTION_KEY = Fernet.generate_key().decode()
 
+# Cache : Redis en production (REDIS_URL, voir docker-compose.yml), mémoire locale sinon.
+# Le cache mémoire locale est propre à chaque processus : l'invalidation par signaux
+# (documents/signals.py) n'atteint pas les autres workers gunicorn, dont les statistiques
+# restent alors périmées jusqu'à STATS_CACHE_TIMEOUT. Il ne convient qu'à un seul processus.
+REDIS_URL = env('REDIS_URL', default='')
+if not REDIS_URL and not DEBUG:
+    logger.warning(
+        "ATTENTION: REDIS_URL non défini, cache mémoire locale non partagé entre les processus "
+        "(statistiques périmées jusqu'à STATS_CACHE_TIMEOUT avec plusieurs workers)"
+    )
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Durée de vie des statistiques utilisateur en cache (invalidées par signaux, voir documents/signals.py)
+STATS_CACHE_TIMEOUT = env.int('STATS_CACHE_TIMEOUT', default=300)
+
+# Les tableaux de bord d'administration lisent l'agrégat journalier DailyUsage
+# (commande refresh_usage_rollup) au lieu des tables complètes. À activer une fois
+# deploy/usage-rollup.timer installé ; un agrégat plus vieux que USAGE_ROLLUP_MAX_AGE
+# secondes est ignoré au profit des comptages directs
+USAGE_ROLLUP_ENABLED = env.bool('USAGE_ROLLUP_ENABLED', default=False)
+USAGE_ROLLUP_MAX_AGE = env.int('USAGE_ROLLUP_MAX_AGE', default=3600)
+
+# Pool de processus pour le traitement PDF (voir documents/pdf_pool.py)
+# PDF_WORKER_PROCESSES=0 exécute le traitement directement dans le thread de la requête
+PDF_WORKER_PROCESSES = env.int('PDF_WORKER_PROCESSES', default=2)
+PDF_WORKER_MAX_PENDING = env.int('PDF_WORKER_MAX_PENDING', default=4)
+PDF_WORKER_TIMEOUT = env.int('PDF_WORKER_TIMEOUT', default=20)  # En secondes, sous le proxy_read_timeout de nginx (30s)
+
+# Taille maximale, par processus, des caches de signatures sauvegardées déchiffrées
+# et décodées (voir documents/signature_cache.py), en octets ; 0 désactive le cache
+SIGNATURE_CACHE_MAX_BYTES = env.int('SIGNATURE_CACHE_MAX_BYTES', default=32 * 1024 * 1024)
+
+# Délai maximal, en secondes, avant l'écriture groupée des dates de dernière utilisation
+# des signatures sauvegardées (voir documents/signature_usage.py) ; 0 écrit immédiatement
+SIGNATURE_USAGE_FLUSH_INTERVAL = env.int('SIGNATURE_USAGE_FLUSH_INTERVAL', default=60)
+
+# Nombre de paires de clés RSA pré-générées pour la création des certificats
+# (python manage.py refill_key_pool [--loop]) ; un pool vide retombe sur la génération immédiate
+CERTIFICATE_KEY_POOL_SIZE = env.int('CERTIFICATE_KEY_POOL_SIZE', default=50)
+
 # Stripe Configuration
 STRIPE_SECRET_KEY = os.environ.get('STRIPE_SECRET_KEY')
 STRIPE_WEBHOOK_SECRET = os.environ.get('STRIPE_WEBHOOK_SECRET')
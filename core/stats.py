@@ -0,0 +1,77 @@
+"""
+Séries statistiques mensuelles pour les tableaux de bord.
+
+Une série de N mois est calculée par une seule requête groupée (TruncMonth) ; les
+mois sans données sont complétés à zéro en Python. Utilisable pour n'importe quel
+modèle daté : documents, signatures, certificats, paiements...
+"""
+import calendar
+from datetime import date, datetime
+
+from django.conf import settings
+from django.db.models import Count, DateTimeField
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+
+def month_starts(months=13, today=None):
+    """
+    Premiers jours des `months` derniers mois, du plus ancien au mois courant
+
+    Les mois sont comptés par calendrier (et non par tranches de 30 jours) :
+    aucun mois n'est sauté ni répété.
+    """
+    today = today or timezone.localdate()
+    index = today.year * 12 + today.month - 1
+    return [
+        date(i // 12, i % 12 + 1, 1)
+        for i in range(index - months + 1, index + 1)
+    ]
+
+
+def monthly_series(queryset, date_field='created_at', months=13, aggregate=None, key='count', today=None):
+    """
+    Agrège un queryset par mois sur les `months` derniers mois
+
+    Args:
+        queryset (QuerySet): Lignes à agréger (déjà filtrées, par utilisateur par exemple)
+        date_field (str): Champ date/datetime servant au regroupement
+        months (int): Nombre de mois, mois courant inclus
+        aggregate (Aggregate, optional): Valeur par mois (Count('pk') par défaut, Sum('amount')...)
+        key (str): Nom de la valeur dans chaque élément de la série
+        today (date, optional): Date de référence (aujourd'hui par défaut)
+
+    Returns:
+        list[dict]: [{'month': 'Jan', 'year': 2025, key: valeur}, ...] du plus ancien au plus récent
+    """
+    starts = month_starts(months, today)
+    first_month = starts[0]
+    if isinstance(queryset.model._meta.get_field(date_field), DateTimeField):
+        first_month = datetime(first_month.year, first_month.month, 1)
+        if settings.USE_TZ:
+            first_month = timezone.make_aware(first_month)
+
+    rows = (
+        queryset
+        .filter(**{f'{date_field}__gte': first_month})
+        .annotate(stats_month=TruncMonth(date_field))
+        .values('stats_month')
+        .annotate(stats_value=aggregate or Count('pk'))
+        .order_by()
+    )
+    values = {}
+    for row in rows:
+        month = row['stats_month']
+        if isinstance(month, datetime):
+            month = timezone.localtime(month).date() if timezone.is_aware(month) else month.date()
+        values[month.replace(day=1)] = row['stats_value'] or 0
+
+    return [
+        {
+            'month': calendar.month_name[start.month][:3],
+            'year': start.year,
+            key: values.get(start, 0),
+        }
+        for start in starts
+    ]
+
@@ -19,11 +19,13 @@ urlpatterns = [
 
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
     path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
-    
-    # Servir les fichiers média également en production
-    path('media/<path:path>', serve, {'document_root': settings.MEDIA_ROOT}),
 ]
 
 # En mode développement uniquement, utiliser la méthode standard de Django
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+elif settings.SERVE_MEDIA_WITH_DJANGO:
+    # Servir les fichiers média également en production (sans nginx devant /media/)
+    urlpatterns += [
+        path('media/<path:path>', serve, {'document_root': settings.MEDIA_ROOT}),
+    ]
\ No newline at end of file
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class DocumentsConfig(AppConfig):
+    name = 'documents'
+
+    def ready(self):
+        # Invalidation du cache des statistiques et des signatures sauvegardées
+        from . import signals  # noqa: F401
@@ -0,0 +1,167 @@
+"""
+Chiffrement des signatures sauvegardées.
+
+Le chiffreur est construit une seule fois par processus à partir des réglages :
+SIGNATURE_ENCRYPTION_KEY chiffre, SIGNATURE_ENCRYPTION_OLD_KEYS (anciennes clés,
+conservées pendant une rotation) ne servent qu'à déchiffrer, via MultiFernet. Il
+est reconstruit automatiquement si les clés changent (tests, rotation à chaud).
+
+Les durées et le nombre d'opérations sont comptés en mémoire (cipher_stats) au
+lieu d'être écrits sur la sortie standard.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+import logging
+
+# Configurer le logger
+logger = logging.getLogger(__name__)
+
+# Préfixe d'un jeton Fernet encodé en base64 (octet de version 0x80)
+FERNET_PREFIX = 'gAAAAA'
+
+_lock = threading.Lock()
+_cipher = None
+_cipher_keys = None
+_stats = {}
+
+
+def configured_keys():
+    """Clé courante puis anciennes clés, telles que définies dans les réglages"""
+    primary = getattr(settings, 'SIGNATURE_ENCRYPTION_KEY', None)
+    if not primary:
+        raise ImproperlyConfigured("Clé de chiffrement non configurée")
+    old_keys = getattr(settings, 'SIGNATURE_ENCRYPTION_OLD_KEYS', None) or []
+    return tuple(key.strip() for key in [primary, *old_keys] if key and key.strip())
+
+
+def get_cipher():
+    """MultiFernet partagé par le processus (reconstruit si les clés ont changé)"""
+    global _cipher, _cipher_keys
+    keys = configured_keys()
+    cipher = _cipher
+    if cipher is not None and _cipher_keys == keys:
+        return cipher
+    with _lock:
+        if _cipher is None or _cipher_keys != keys:
+            _cipher = MultiFernet([Fernet(key.encode()) for key in keys])
+            _cipher_keys = keys
+            logger.info(f"Chiffreur des signatures initialisé ({len(keys)} clé(s))")
+        return _cipher
+
+
+def is_encrypted(value):
+    return isinstance(value, str) and value.startswith(FERNET_PREFIX)
+
+
+@contextmanager
+def _timed(operation):
+    start = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except Exception:
+        failed = True
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        with _lock:
+            counter = _stats.setdefault(operation, {'count': 0, 'errors': 0, 'seconds': 0.0})
+            counter['count'] += 1
+            counter['seconds'] += elapsed
+            if failed:
+                counter['errors'] += 1
+
+
+def encrypt(value):
+    """Chiffre une chaîne avec la clé courante"""
+    with _timed('encrypt'):
+        return get_cipher().encrypt(value.encode()).decode()
+
+
+def decrypt(token):
+    """
+    Déchiffre un jeton avec la clé courante ou une ancienne clé
+
+    Raises:
+        InvalidToken: si aucune clé configurée ne correspond
+    """
+    with _timed('decrypt'):
+        return get_cipher().decrypt(token.strip().encode()).decode()
+
+
+def rotate(token):
+    """Rechiffre un jeton avec la clé courante (le contenu n'est pas exposé)"""
+    with _timed('rotate'):
+        return get_cipher().rotate(token.strip().encode()).decode()
+
+
+def cipher_stats():
+    """
+    Compteurs depuis le démarrage du processus
+
+    Returns:
+        dict: {'decrypt': {'count', 'errors', 'seconds', 'average_ms'}, ...}
+    """
+    with _lock:
+        return {
+            operation: {
+                **counter,
+                'average_ms': counter['seconds'] * 1000 / counter['count'] if counter['count'] else 0.0,
+            }
+            for operation, counter in _stats.items()
+        }
+
+
+def reset_cipher_stats():
+    with _lock:
+        _stats.clear()
+
+
+# Rotation en masse (commande rotate_signature_key). Ces fonctions s'exécutent aussi
+# dans des processus de travail : elles reçoivent les clés en argument et
+# n'accèdent pas aux réglages Django.
+_batch_ciphers = {}
+
+
+def _batch_cipher(keys):
+    if keys not in _batch_ciphers:
+        fernets = [Fernet(key.encode()) for key in keys]
+        _batch_ciphers[keys] = (fernets[0], MultiFernet(fernets))
+    return _batch_ciphers[keys]
+
+
+def rotate_batch(keys, items):
+    """
+    Rechiffre des valeurs avec la première clé de `keys`
+
+    Args:
+        keys (tuple): Clé courante puis anciennes clés
+        items (list): [(pk, valeur stockée), ...]
+
+    Returns:
+        list: [(pk, nouvelle valeur ou None si déjà à jour, erreur ou None), ...]
+    """
+    primary, cipher = _batch_cipher(keys)
+    results = []
+    for pk, value in items:
+        try:
+            if not is_encrypted(value):
+                # Donnée enregistrée en clair : la chiffrer
+                results.append((pk, primary.encrypt(value.strip().encode()).decode(), None))
+                continue
+            token = value.strip().encode()
+            try:
+                # HMAC valide avec la clé courante : rien à réécrire
+                primary.extract_timestamp(token)
+                results.append((pk, None, None))
+            except InvalidToken:
+                results.append((pk, cipher.rotate(token).decode(), None))
+        except Exception as e:
+            results.append((pk, None, f"{type(e).__name__}: {e}" if str(e) else type(e).__name__))
+    return results
+
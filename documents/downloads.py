@@ -0,0 +1,179 @@
+"""
+Téléchargement des documents en streaming.
+
+Le fichier est envoyé par blocs (mémoire constante quelle que soit sa taille), avec
+prise en charge des requêtes HTTP Range (réponses 206, utilisées par PDF.js et pour
+reprendre un téléchargement) et des requêtes conditionnelles (ETag / Last-Modified,
+réponses 304).
+
+Avec DOCUMENT_DELIVERY = 'nginx', Django ne fait que vérifier les droits : la réponse
+contient un en-tête X-Accel-Redirect vers la location interne DOCUMENT_ACCEL_PREFIX
+et nginx envoie le fichier lui-même (sendfile, Range et ETag gérés par nginx).
+"""
+import hashlib
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe, quote_etag
+import logging
+
+# Configurer le logger
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def document_etag(document):
+    """
+    ETag du fichier courant du document
+
+    Document.hash identifie le contenu déposé ; le nom du fichier change à chaque
+    signature (le stockage génère un nom unique), il est donc ajouté au hash pour
+    que la version signée n'ait pas le même ETag que l'original.
+    """
+    name_digest = hashlib.sha256(document.file.name.encode()).hexdigest()[:12]
+    return quote_etag(f'{document.hash}-{name_digest}')
+
+
+def document_last_modified(document):
+    """Date de dernière modification du fichier, ou None si le stockage ne la fournit pas"""
+    try:
+        return document.file.storage.get_modified_time(document.file.name).timestamp()
+    except (NotImplementedError, OSError):
+        return None
+
+
+def parse_range(header, size):
+    """
+    Analyse un en-tête Range à une seule plage
+
+    Returns:
+        tuple(int, int) | None: (début, fin incluse), ou None si l'en-tête est ignoré
+            (absent, plusieurs plages ou syntaxe invalide : le fichier complet est renvoyé)
+
+    Raises:
+        ValueError: Si la plage est hors du fichier (réponse 416)
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+
+    if not first:
+        # Suffixe : les N derniers octets
+        length = int(last)
+        if length == 0:
+            raise ValueError("Plage vide")
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("Plage hors du fichier")
+    return start, end
+
+
+def _iter_range(file, start, length):
+    """Lit une plage du fichier par blocs"""
+    try:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+def accel_redirect_path(document):
+    """
+    Chemin interne nginx du fichier, ou None si la livraison par nginx n'est pas possible
+    (désactivée, ou stockage sans fichier local)
+    """
+    if getattr(settings, 'DOCUMENT_DELIVERY', 'django') != 'nginx':
+        return None
+    try:
+        document.file.storage.path(document.file.name)
+    except NotImplementedError:
+        return None
+    prefix = getattr(settings, 'DOCUMENT_ACCEL_PREFIX', '/protected-media/').rstrip('/')
+    return f"{prefix}/{quote(document.file.name)}"
+
+
+def serve_document(request, document, filename=None, as_attachment=True):
+    """
+    Construit la réponse de téléchargement d'un document
+
+    Args:
+        request: Requête HTTP (en-têtes Range, If-None-Match, If-Modified-Since, If-Range)
+        document (Document): Document dont le fichier courant est envoyé
+        filename (str, optional): Nom proposé au navigateur (titre du document par défaut)
+        as_attachment (bool): Content-Disposition attachment ou inline
+
+    Returns:
+        HttpResponse: 200, 206, 304 ou 416
+    """
+    etag = document_etag(document)
+    last_modified = document_last_modified(document)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        return response
+
+    filename = filename or f"{document.title}.pdf"
+    accel_path = accel_redirect_path(document)
+    if accel_path:
+        # nginx conserve Content-Type, Content-Disposition et Cache-Control de cette réponse
+        response = HttpResponse(content_type='application/pdf')
+        response['X-Accel-Redirect'] = accel_path
+        response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    size = document.file.size
+    byte_range = None
+    if request.method == 'GET':
+        # If-Range : la plage n'est valable que si le fichier n'a pas changé
+        if_range = request.META.get('HTTP_IF_RANGE')
+        if not if_range or if_range == etag or (
+            last_modified and parse_http_date_safe(if_range) == int(last_modified)
+        ):
+            try:
+                byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{size}'
+                return response
+
+    file = document.file.storage.open(document.file.name, 'rb')
+    if byte_range is None:
+        response = FileResponse(
+            file,
+            as_attachment=as_attachment,
+            filename=filename,
+            content_type='application/pdf',
+        )
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(_iter_range(file, start, length), status=206, content_type='application/pdf')
+        response['Content-Length'] = str(length)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    # Documents privés : les caches partagés ne doivent pas les conserver
+    response['Cache-Control'] = 'private, no-cache'
+    return response
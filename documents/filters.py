@@ -0,0 +1,23 @@
+import django_filters
+
+from .models import Document, DocumentSigner
+
+
+class DocumentFilter(django_filters.FilterSet):
+    """Filtres de la liste des documents : statut et période de dépôt"""
+    created_after = django_filters.IsoDateTimeFilter(field_name='created_at', lookup_expr='gte')
+    created_before = django_filters.IsoDateTimeFilter(field_name='created_at', lookup_expr='lt')
+
+    class Meta:
+        model = Document
+        fields = ['status', 'created_after', 'created_before']
+
+
+class DocumentSignerFilter(django_filters.FilterSet):
+    """Filtres de la liste des signataires : statut et période d'invitation"""
+    invited_after = django_filters.IsoDateTimeFilter(field_name='invitation_sent_at', lookup_expr='gte')
+    invited_before = django_filters.IsoDateTimeFilter(field_name='invitation_sent_at', lookup_expr='lt')
+
+    class Meta:
+        model = DocumentSigner
+        fields = ['status', 'invited_after', 'invited_before']
@@ -0,0 +1,93 @@
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from certificates.models import Certificate
+from documents.models import Document, Signature
+from documents.views import DocumentViewSet
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Vérifie que la liste et le détail des documents exécutent un nombre de requêtes '
+        'indépendant du nombre de documents (données de test créées puis annulées)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 50],
+                            help='Nombres de documents à tester')
+        parser.add_argument('--signatures', type=int, default=3,
+                            help='Nombre de signatures par document')
+
+    def handle(self, *args, **options):
+        results = []
+        for size in options['sizes']:
+            results.append((size, *self.measure(size, options['signatures'])))
+
+        for size, list_queries, retrieve_queries in results:
+            self.stdout.write(f'{size} document(s): liste={list_queries} requêtes, détail={retrieve_queries} requêtes')
+
+        if len({list_queries for _, list_queries, _ in results}) > 1:
+            raise CommandError('Le nombre de requêtes de la liste dépend du nombre de documents')
+        if len({retrieve_queries for _, _, retrieve_queries in results}) > 1:
+            raise CommandError('Le nombre de requêtes du détail dépend du nombre de documents')
+        self.stdout.write(self.style.SUCCESS('Nombre de requêtes constant'))
+
+    def measure(self, size, signatures_per_document):
+        """Crée les données dans une transaction annulée et compte les requêtes des vues"""
+        # Les sérialiseurs construisent des URL absolues : l'hôte doit passer ALLOWED_HOSTS
+        factory = APIRequestFactory(HTTP_HOST=self.request_host())
+        with transaction.atomic():
+            user = User(email=f'query-check-{uuid.uuid4().hex}@example.com', username=uuid.uuid4().hex)
+            user.set_unusable_password()
+            user.save()
+            certificate = Certificate.objects.create(
+                user=user, public_key='-', private_key='-',
+                valid_until=timezone.now() + timezone.timedelta(days=1),
+            )
+            # bulk_create : aucun fichier n'est écrit sur le stockage
+            documents = Document.objects.bulk_create([
+                Document(title=f'Document {i}', file='documents/query-check.pdf', uploaded_by=user, hash=uuid.uuid4().hex)
+                for i in range(size)
+            ])
+            Signature.objects.bulk_create([
+                Signature(document=document, signer=user, certificate=certificate, signature_data='-')
+                for document in documents
+                for _ in range(signatures_per_document)
+            ])
+
+            list_queries = self.count_queries(
+                factory.get('/api/documents/'), user, DocumentViewSet.as_view({'get': 'list'})
+            )
+            retrieve_queries = self.count_queries(
+                factory.get(f'/api/documents/{documents[0].pk}/'), user,
+                DocumentViewSet.as_view({'get': 'retrieve'}), pk=documents[0].pk,
+            )
+            transaction.set_rollback(True)
+        return list_queries, retrieve_queries
+
+    def request_host(self):
+        """Premier hôte de ALLOWED_HOSTS utilisable comme en-tête Host"""
+        for host in settings.ALLOWED_HOSTS:
+            host = host.lstrip('.')
+            if host and host != '*':
+                return host
+        if settings.ALLOWED_HOSTS or settings.DEBUG:
+            # '*' accepte tout hôte ; en DEBUG, localhost est toujours accepté
+            return 'localhost'
+        raise CommandError('ALLOWED_HOSTS est vide : aucun hôte accepté pour les requêtes de test')
+
+    def count_queries(self, request, user, view, **kwargs):
+        force_authenticate(request, user=user)
+        with CaptureQueriesContext(connection) as queries:
+            response = view(request, **kwargs)
+            response.render()
+        if response.status_code != 200:
+            raise CommandError(f'Réponse inattendue ({response.status_code}) : {response.content[:200]}')
+        return len(queries.captured_queries)
@@ -0,0 +1,74 @@
+import os
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils import timezone
+
+from documents.models import Document, StoredBlob
+from documents.storage import BLOB_PREFIX, content_addressed_storage
+
+
+class Command(BaseCommand):
+    help = 'Supprime les blobs de documents qui ne sont plus référencés'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=int, default=24,
+                            help='Délai minimal en heures avant suppression d\'un blob non référencé')
+        parser.add_argument('--recount', action='store_true',
+                            help='Recalcule les compteurs de références depuis la table des documents')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Affiche les blobs à supprimer sans les supprimer')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['grace_hours'])
+
+        if options['recount']:
+            self.recount()
+
+        # Blobs connus dont plus aucun document ne dépend
+        deleted = 0
+        freed = 0
+        for blob in StoredBlob.objects.filter(ref_count__lte=0, unreferenced_at__lt=cutoff).iterator():
+            if not options['dry_run']:
+                content_addressed_storage.delete(blob.name)
+            deleted += 1
+            freed += blob.size
+
+        # Fichiers présents sur le disque sans entrée StoredBlob (écriture interrompue)
+        orphans = 0
+        known = set(StoredBlob.objects.values_list('name', flat=True))
+        root = content_addressed_storage.path(BLOB_PREFIX)
+        for directory, _, files in os.walk(root):
+            for file_name in files:
+                path = os.path.join(directory, file_name)
+                name = os.path.relpath(path, content_addressed_storage.location).replace(os.sep, '/')
+                if name in known:
+                    continue
+                if datetime.fromtimestamp(os.path.getmtime(path), tz=dt_timezone.utc) >= cutoff:
+                    continue
+                if not options['dry_run']:
+                    os.remove(path)
+                orphans += 1
+
+        prefix = '[dry-run] ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}{deleted} blob(s) supprimé(s) ({freed} octets), {orphans} fichier(s) orphelin(s)'
+        ))
+
+    def recount(self):
+        """Corrige les compteurs (suppressions en masse qui contournent Document.delete)"""
+        counts = dict(
+            Document.objects.filter(file__startswith=f'{BLOB_PREFIX}/')
+            .values_list('file').annotate(total=Count('id'))
+        )
+        updated = []
+        now = timezone.now()
+        for blob in StoredBlob.objects.all().iterator():
+            ref_count = counts.get(blob.name, 0)
+            if ref_count != blob.ref_count:
+                blob.ref_count = ref_count
+                blob.unreferenced_at = None if ref_count else (blob.unreferenced_at or now)
+                updated.append(blob)
+        StoredBlob.objects.bulk_update(updated, ['ref_count', 'unreferenced_at'])
+        self.stdout.write(f'{len(updated)} compteur(s) de références corrigé(s)')
@@ -0,0 +1,97 @@
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from documents.models import Document, DocumentSigner, Signature
+from subscriptions.models import PaymentHistory, Subscription
+
+
+class Command(BaseCommand):
+    help = (
+        "Affiche le plan d'exécution (EXPLAIN) des requêtes les plus fréquentes et vérifie "
+        "qu'elles utilisent l'index prévu. Sous PostgreSQL, le planificateur préfère un parcours "
+        "séquentiel sur une table presque vide : lancer la commande sur une base représentative."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--analyze', action='store_true',
+                            help='EXPLAIN ANALYZE (PostgreSQL uniquement, exécute les requêtes)')
+        parser.add_argument('--strict', action='store_true',
+                            help="Échoue si une requête n'utilise pas l'index attendu")
+
+    def hot_queries(self):
+        """(description, queryset, index attendu) ; les valeurs n'ont pas besoin d'exister"""
+        user_id = uuid.uuid4()
+        document_id = uuid.uuid4()
+        since = timezone.now() - timezone.timedelta(days=30)
+        return [
+            (
+                'Liste des documents (pagination par curseur)',
+                Document.objects.filter(uploaded_by_id=user_id).order_by('-created_at', '-id')[:21],
+                'document_owner_created_idx',
+            ),
+            (
+                'Documents en attente d\'un utilisateur',
+                Document.objects.filter(uploaded_by_id=user_id, status='pending').order_by('-created_at'),
+                'document_owner_status_idx',
+            ),
+            (
+                'Documents déposés depuis une date (administration, agrégat)',
+                Document.objects.filter(created_at__gte=since),
+                'document_created_idx',
+            ),
+            (
+                "Signatures d'un utilisateur sur une période",
+                Signature.objects.filter(signer_id=user_id, timestamp__gte=since),
+                'signature_signer_time_idx',
+            ),
+            (
+                'Abonnement actif le plus récent',
+                Subscription.objects.filter(user_id=user_id, status='active').order_by('-created_at')[:1],
+                'subscription_user_status_idx',
+            ),
+            (
+                "Signataires d'un document (pagination par curseur)",
+                DocumentSigner.objects.filter(document_id=document_id).order_by('-invitation_sent_at', '-id')[:21],
+                'signer_document_invited_idx',
+            ),
+            (
+                "Signataires en attente d'un document",
+                DocumentSigner.objects.filter(document_id=document_id, status='pending'),
+                'signer_document_status_idx',
+            ),
+            (
+                'Paiement PayDunya en attente par token',
+                PaymentHistory.objects.filter(paydunya_token='token', status='pending'),
+                'payment_paydunya_status_idx',
+            ),
+        ]
+
+    def handle(self, *args, **options):
+        explain_options = {}
+        if options['analyze']:
+            if connection.vendor != 'postgresql':
+                raise CommandError('--analyze nécessite PostgreSQL')
+            explain_options['analyze'] = True
+
+        queries = self.hot_queries()
+        missing = []
+        for description, queryset, index_name in queries:
+            plan = queryset.explain(**explain_options)
+            self.stdout.write(self.style.MIGRATE_HEADING(description))
+            self.stdout.write(plan)
+            if index_name in plan:
+                self.stdout.write(self.style.SUCCESS(f'-> index {index_name} utilisé'))
+            else:
+                missing.append(index_name)
+                self.stdout.write(self.style.WARNING(f'-> index {index_name} non utilisé'))
+            self.stdout.write('')
+
+        if missing and options['strict']:
+            raise CommandError(f"Index non utilisés : {', '.join(missing)}")
+        self.stdout.write(self.style.SUCCESS(
+            f'{connection.vendor} : {len(queries) - len(missing)} requête(s) sur '
+            f'{len(queries)} utilisent leur index'
+        ))
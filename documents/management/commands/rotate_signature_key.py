@@ -0,0 +1,200 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from documents import crypto
+from documents.models import SavedSignature
+
+
+class Command(BaseCommand):
+    help = (
+        "Rechiffre les signatures sauvegardées avec la clé SIGNATURE_ENCRYPTION_KEY. "
+        "Pendant la rotation, l'ancienne clé doit figurer dans SIGNATURE_ENCRYPTION_OLD_KEYS ; "
+        "elle peut en être retirée une fois la commande terminée sans erreur. "
+        "La commande reprend au dernier lot enregistré si elle est interrompue."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Nombre de signatures lues, rechiffrées et écrites par lot')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Processus de rechiffrement (0 : dans le processus courant)')
+        parser.add_argument('--checkpoint', default=os.path.join(settings.BASE_DIR, '.rotate_signature_key.json'),
+                            help='Fichier de reprise')
+        parser.add_argument('--restart', action='store_true',
+                            help='Ignore le fichier de reprise et repart du début')
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Rechiffre sans écrire en base (estimation de la durée)")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size <= 0:
+            raise CommandError('--batch-size doit être positif')
+        keys = crypto.configured_keys()
+        # Empreinte de la clé cible : une reprise n'est valable que pour la même rotation
+        fingerprint = hashlib.sha256(keys[0].encode()).hexdigest()[:16]
+
+        checkpoint = self.load_checkpoint(options['checkpoint'], fingerprint, options['restart'] or options['dry_run'])
+        totals = checkpoint['totals']
+        queryset = SavedSignature.objects.order_by('pk')
+        if checkpoint['last_pk']:
+            queryset = queryset.filter(pk__gt=checkpoint['last_pk'])
+            self.stdout.write(f"Reprise après {checkpoint['last_pk']} ({totals['processed']} déjà traitées)")
+        remaining = queryset.count()
+        self.stdout.write(
+            f"{remaining} signature(s) à traiter, lots de {batch_size}, "
+            f"{options['workers'] or 'aucun'} processus, {len(keys)} clé(s) configurée(s)"
+        )
+
+        rows = queryset.values_list('pk', 'signature_data').iterator(chunk_size=batch_size)
+        batches = iter(lambda: list(islice(rows, batch_size)), [])
+        executor = self.make_executor(options['workers'])
+        started = time.monotonic()
+        done = 0
+        try:
+            for batch, results in self.rotated_batches(batches, keys, executor, options['workers']):
+                if options['dry_run']:
+                    written = {pk for pk, value, error in results if value is not None}
+                else:
+                    written = self.write_batch(batch, results)
+                self.count(results, written, totals)
+                done += len(batch)
+                checkpoint['last_pk'] = str(batch[-1][0])
+                if not options['dry_run']:
+                    self.save_checkpoint(options['checkpoint'], checkpoint)
+                self.report_progress(done, remaining, started, totals)
+        finally:
+            if executor:
+                executor.shutdown(cancel_futures=True)
+
+        elapsed = time.monotonic() - started
+        prefix = '[dry-run] ' if options['dry_run'] else ''
+        summary = (
+            f"{prefix}{totals['processed']} signature(s) traitée(s) : {totals['rotated']} rechiffrée(s), "
+            f"{totals['current']} déjà à jour, {totals['changed']} modifiée(s) pendant la rotation, "
+            f"{totals['errors']} erreur(s) en {elapsed:.1f} s"
+        )
+        if totals['errors']:
+            self.stdout.write(self.style.WARNING(summary))
+            self.stdout.write(self.style.WARNING(
+                f"Signatures indéchiffrables (premières) : {', '.join(totals['error_ids'])}"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
+            if not options['dry_run'] and os.path.exists(options['checkpoint']):
+                os.remove(options['checkpoint'])
+
+    def make_executor(self, workers):
+        if workers <= 0:
+            return None
+        # Même choix de démarrage que le pool PDF (documents/pdf_pool.py)
+        context = multiprocessing.get_context(
+            'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        )
+        return ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+    def rotated_batches(self, batches, keys, executor, workers):
+        """
+        Rechiffre les lots dans l'ordre de lecture
+
+        Avec des processus de travail, au plus deux lots par processus sont en
+        cours : les lots suivants sont rechiffrés pendant l'écriture du lot
+        courant, sans charger toute la table en mémoire.
+        """
+        if executor is None:
+            for batch in batches:
+                yield batch, crypto.rotate_batch(keys, batch)
+            return
+        pending = deque()
+        for batch in batches:
+            pending.append((batch, executor.submit(crypto.rotate_batch, keys, batch)))
+            if len(pending) >= workers * 2:
+                batch, future = pending.popleft()
+                yield batch, future.result()
+        while pending:
+            batch, future = pending.popleft()
+            yield batch, future.result()
+
+    def write_batch(self, batch, results):
+        """
+        Écrit un lot avec bulk_update
+
+        Les lignes modifiées depuis leur lecture (signature réenregistrée par son
+        propriétaire, donc déjà chiffrée avec la clé courante) ou supprimées entre-temps
+        ne sont pas réécrites.
+
+        Returns:
+            set: identifiants effectivement réécrits
+        """
+        read_values = dict(batch)
+        updates = {pk: value for pk, value, error in results if value is not None}
+        if not updates:
+            return set()
+        with transaction.atomic():
+            current = dict(
+                SavedSignature.objects.select_for_update()
+                .filter(pk__in=list(updates)).values_list('pk', 'signature_data')
+            )
+            signatures = [
+                SavedSignature(pk=pk, signature_data=value)
+                for pk, value in updates.items()
+                if pk in current and current[pk] == read_values[pk]
+            ]
+            SavedSignature.objects.bulk_update(signatures, ['signature_data'], batch_size=len(signatures) or None)
+        return {signature.pk for signature in signatures}
+
+    def count(self, results, written, totals):
+        for pk, value, error in results:
+            totals['processed'] += 1
+            if error:
+                totals['errors'] += 1
+                if len(totals['error_ids']) < 20:
+                    totals['error_ids'].append(str(pk))
+            elif value is None:
+                totals['current'] += 1
+            elif pk in written:
+                totals['rotated'] += 1
+            else:
+                totals['changed'] += 1
+
+    def report_progress(self, done, remaining, started, totals):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        rate = done / elapsed
+        eta = (remaining - done) / rate if rate else 0
+        percent = done * 100 / remaining if remaining else 100
+        self.stdout.write(
+            f"{done}/{remaining} ({percent:.1f} %) - {rate:.0f} signatures/s - "
+            f"fin estimée dans {eta:.0f} s - {totals['errors']} erreur(s)"
+        )
+
+    def load_checkpoint(self, path, fingerprint, restart):
+        empty = {
+            'key': fingerprint,
+            'last_pk': None,
+            'totals': {'processed': 0, 'rotated': 0, 'current': 0, 'changed': 0, 'errors': 0, 'error_ids': []},
+        }
+        if restart or not os.path.exists(path):
+            return empty
+        with open(path) as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+        if checkpoint.get('key') != fingerprint:
+            self.stdout.write(self.style.WARNING('Fichier de reprise créé pour une autre clé : ignoré'))
+            return empty
+        return checkpoint
+
+    def save_checkpoint(self, path, checkpoint):
+        # Écriture atomique : un arrêt brutal ne laisse pas de fichier tronqué
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as checkpoint_file:
+            json.dump(checkpoint, checkpoint_file)
+        os.replace(temporary, path)
+
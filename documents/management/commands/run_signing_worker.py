@@ -0,0 +1,70 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from documents.models import SigningJob
+
+
+class Command(BaseCommand):
+    help = 'Exécute les travaux de signature asynchrones enregistrés en base'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help="Délai d'attente en secondes quand la file est vide")
+        parser.add_argument('--lease', type=int, default=SigningJob.LEASE_SECONDS,
+                            help='Durée en secondes du bail d\'un travail, prolongé tant que le worker est en vie ; '
+                                 'un travail dont le bail a expiré est remis en attente')
+        parser.add_argument('--once', action='store_true',
+                            help='Traite les travaux en attente puis s\'arrête')
+
+    def handle(self, *args, **options):
+        self.requeue_stale()
+
+        self.stdout.write(self.style.SUCCESS('Worker de signature démarré'))
+        try:
+            while True:
+                close_old_connections()
+                job = SigningJob.claim_next(lease=options['lease'])
+                if job is None:
+                    if options['once']:
+                        break
+                    # File vide : reprendre les travaux des workers arrêtés
+                    self.requeue_stale()
+                    time.sleep(options['interval'])
+                    continue
+
+                self.run_with_heartbeat(job, options['lease'])
+                self.stdout.write(f'Travail {job.id}: {job.status}')
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS('Worker de signature arrêté'))
+
+    def requeue_stale(self):
+        requeued = SigningJob.requeue_stale()
+        if requeued:
+            self.stdout.write(self.style.WARNING(f'{requeued} travail(aux) interrompu(s) remis en attente'))
+
+    def run_with_heartbeat(self, job, lease):
+        """Exécute le travail en prolongeant son bail depuis un thread, toutes les lease/3 secondes"""
+        stop = threading.Event()
+
+        def heartbeat():
+            try:
+                while not stop.wait(lease / 3):
+                    if not job.renew_lease(lease):
+                        # Travail repris par un autre worker : run() n'appliquera pas le résultat
+                        self.stderr.write(self.style.WARNING(f'Bail du travail {job.id} perdu'))
+                        break
+            finally:
+                # Connexion propre au thread
+                connection.close()
+
+        thread = threading.Thread(target=heartbeat, daemon=True)
+        thread.start()
+        try:
+            job.run()
+        finally:
+            stop.set()
+            thread.join()
@@ -0,0 +1,111 @@
+# Generated by Django 5.0.3 on 2026-10-17 01:35
+
+import documents.models
+import documents.storage
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Document',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=255)),
+                ('file', models.FileField(storage=documents.storage.get_document_storage, upload_to='documents/', validators=[documents.models.validate_file_type])),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('signed', 'Signed')], default='pending', max_length=20)),
+                ('hash', models.CharField(blank=True, max_length=64, unique=True)),
+                ('page_geometry', models.JSONField(blank=True, editable=False, null=True)),
+            ],
+            options={
+                'permissions': [('can_sign_document', 'Can sign document'), ('can_view_document', 'Can view document')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DocumentSigner',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('email', models.EmailField(max_length=254)),
+                ('full_name', models.CharField(max_length=255)),
+                ('token', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('status', models.CharField(choices=[('pending', 'En attente'), ('signed', 'Signé'), ('rejected', 'Refusé'), ('expired', 'Expiré')], default='pending', max_length=20)),
+                ('invitation_sent_at', models.DateTimeField(auto_now_add=True)),
+                ('invitation_expires_at', models.DateTimeField(blank=True, null=True)),
+                ('signed_at', models.DateTimeField(blank=True, null=True)),
+                ('reminder_sent_at', models.DateTimeField(blank=True, null=True)),
+                ('reminder_count', models.IntegerField(default=0)),
+                ('signature_position_x', models.FloatField(blank=True, null=True)),
+                ('signature_position_y', models.FloatField(blank=True, null=True)),
+                ('signature_page', models.IntegerField(default=1)),
+                ('message', models.TextField(blank=True, null=True)),
+                ('notes', models.TextField(blank=True, null=True)),
+                ('created_user', models.BooleanField(default=False)),
+            ],
+            options={
+                'verbose_name': 'Signataire de document',
+                'verbose_name_plural': 'Signataires de document',
+            },
+        ),
+        migrations.CreateModel(
+            name='SavedSignature',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100, verbose_name='Nom de la signature')),
+                ('signature_data', models.TextField(verbose_name='Données de signature chiffrées')),
+                ('is_default', models.BooleanField(default=False, verbose_name='Signature par défaut')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('last_used_at', models.DateTimeField(blank=True, null=True, verbose_name='Dernière utilisation')),
+            ],
+            options={
+                'verbose_name': 'Signature enregistrée',
+                'verbose_name_plural': 'Signatures enregistrées',
+                'ordering': ['-is_default', '-last_used_at', '-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Signature',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('signature_data', models.TextField()),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+                ('drawn_signature', models.TextField(blank=True, null=True)),
+                ('signature_position_x', models.FloatField(blank=True, null=True)),
+                ('signature_position_y', models.FloatField(blank=True, null=True)),
+                ('signature_page', models.IntegerField(blank=True, default=1, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SigningJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('placements', models.JSONField()),
+                ('status', models.CharField(choices=[('pending', 'En attente'), ('running', 'En cours'), ('done', 'Terminé'), ('failed', 'Échoué')], default='pending', max_length=20)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StoredBlob',
+            fields=[
+                ('digest', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('size', models.BigIntegerField(default=0)),
+                ('ref_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('unreferenced_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
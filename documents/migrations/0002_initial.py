@@ -0,0 +1,113 @@
+# Generated by Django 5.0.3 on 2026-10-17 01:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('certificates', '0002_initial'),
+        ('documents', '0001_initial'),
+        ('subscriptions', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='uploaded_by',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='uploaded_documents', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='documentsigner',
+            name='document',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='signers', to='documents.document'),
+        ),
+        migrations.AddField(
+            model_name='documentsigner',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='documents_to_sign', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='savedsignature',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saved_signatures', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='signature',
+            name='certificate',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='certificates.certificate'),
+        ),
+        migrations.AddField(
+            model_name='signature',
+            name='document',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='documents.document'),
+        ),
+        migrations.AddField(
+            model_name='signature',
+            name='saved_signature',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='document_signatures', to='documents.savedsignature'),
+        ),
+        migrations.AddField(
+            model_name='signature',
+            name='signer',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='signatures',
+            field=models.ManyToManyField(related_name='documents', to='documents.signature'),
+        ),
+        migrations.AddField(
+            model_name='signingjob',
+            name='certificate',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='certificates.certificate'),
+        ),
+        migrations.AddField(
+            model_name='signingjob',
+            name='document',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='signing_jobs', to='documents.document'),
+        ),
+        migrations.AddField(
+            model_name='signingjob',
+            name='requested_by',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='signing_jobs', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='signingjob',
+            name='subscription',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='signing_jobs', to='subscriptions.subscription'),
+        ),
+        migrations.AddIndex(
+            model_name='documentsigner',
+            index=models.Index(fields=['document', '-invitation_sent_at', '-id'], name='signer_document_invited_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='documentsigner',
+            unique_together={('document', 'email')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='savedsignature',
+            unique_together={('user', 'name')},
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['uploaded_by', '-created_at', '-id'], name='document_owner_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['uploaded_by', 'status', '-created_at'], name='document_owner_status_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='document',
+            constraint=models.UniqueConstraint(fields=('hash',), name='unique_document_hash'),
+        ),
+        migrations.AddIndex(
+            model_name='signingjob',
+            index=models.Index(fields=['status', 'created_at'], name='signingjob_status_created_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.3 on 2026-10-17 01:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('certificates', '0002_initial'),
+        ('documents', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['created_at'], name='document_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='documentsigner',
+            index=models.Index(fields=['document', 'status'], name='signer_document_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='signature',
+            index=models.Index(fields=['signer', 'timestamp'], name='signature_signer_time_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.3 on 2026-10-17 01:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0003_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='signingjob',
+            name='locked_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
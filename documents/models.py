@@ -1,6 +1,8 @@
+from django.db import models, transaction
+from django.db.models import Q
+from django.core.files import File
+from django.core.exceptions import ImproperlyConfigured, ValidationError
 import hashlib
-from django.db import models
-from django.core.exceptions import ValidationError
 import os
 import uuid
 from users.models import User
@@ -9,9 +11,16 @@ from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
 from django.contrib.auth import get_user_model
-from cryptography.fernet import Fernet
 from subscriptions.models import Subscription
-from .utils import send_notification_email
+from subscriptions.services.quota_service import QuotaService
+from .utils import send_notification_email, calculate_document_hash
+from .pdf_signer import PDFSignatureManager
+from . import crypto, signature_cache, signature_usage
+from .storage import get_document_storage, add_reference, remove_reference
+from .stats_cache import invalidate_user_stats
+import logging
+
+logger = logging.getLogger(__name__)
 User = get_user_model()
 
 
@@ -50,6 +59,12 @@ class Signature(models.Model):
     # Référence à une signature enregistrée (si utilisée)
     saved_signature = models.ForeignKey('SavedSignature', on_delete=models.SET_NULL, null=True, blank=True, related_name='document_signatures')
 
+    class Meta:
+        indexes = [
+            # Signatures d'un utilisateur par période (statistiques, agrégat journalier)
+            models.Index(fields=['signer', 'timestamp'], name='signature_signer_time_idx'),
+        ]
+
     def __str__(self):
         return f"Signature de {self.signer.email} pour {self.document.id}"
 
@@ -81,86 +96,63 @@ class SavedSignature(models.Model):
             SavedSignature.objects.filter(user=self.user, is_default=True).update(is_default=False)
         
         # Si c'est une nouvelle signature et qu'il n'y a pas d'autres signatures, la définir comme par défaut
-        if not self.pk and not SavedSignature.objects.filter(user=self.user).exists():
+        # (la clé primaire UUID est attribuée dès la création de l'objet : se fier à _state.adding)
+        if self._state.adding and not SavedSignature.objects.filter(user=self.user).exists():
             self.is_default = True
         
         # Chiffrer la signature si elle n'est pas déjà chiffrée
-        if not self.pk or kwargs.pop('update_signature', False):
+        update_signature = kwargs.pop('update_signature', False)
+        if self._state.adding or update_signature:
             self.encrypt_signature()
         
         super().save(*args, **kwargs)
     
     def encrypt_signature(self):
         """Chiffre les données de signature avant de les stocker"""
-        if not hasattr(settings, 'SIGNATURE_ENCRYPTION_KEY'):
-            raise ValidationError(_("Clé de chiffrement non configurée"))
-        
-        # S'assurer que la clé est propre (sans espaces)
-        key = settings.SIGNATURE_ENCRYPTION_KEY.strip().encode()
-        
+        # Données déjà chiffrées (jeton Fernet) : rien à faire
+        if not isinstance(self.signature_data, str) or crypto.is_encrypted(self.signature_data):
+            return
         try:
-            # Vérifier si les données sont déjà chiffrées (commencent par gAAAAA)
-            if isinstance(self.signature_data, str) and not self.signature_data.startswith('gAAAAA'):
-                print(f"DEBUG - Chiffrement des données de signature pour {self.name}")
-                # S'assurer que les données sont propres
-                clean_data = self.signature_data.strip()
-                f = Fernet(key)
-                encrypted_data = f.encrypt(clean_data.encode())
-                self.signature_data = encrypted_data.decode()
-                print(f"DEBUG - Signature chiffrée avec succès: {self.signature_data[:50]}...")
-            elif isinstance(self.signature_data, str) and self.signature_data.startswith('gAAAAA'):
-                print(f"DEBUG - Les données sont déjà chiffrées pour {self.name}")
+            self.signature_data = crypto.encrypt(self.signature_data.strip())
+        except ImproperlyConfigured as e:
+            raise ValidationError(_(str(e)))
         except Exception as e:
-            print(f"DEBUG - Erreur lors du chiffrement: {str(e)}")
+            logger.error(f"Erreur lors du chiffrement de la signature {self.pk}: {str(e)}")
             raise ValidationError(_(f"Erreur lors du chiffrement: {str(e)}"))
     
+    @property
+    def image_key(self):
+        """Clé de cache « identifiant:version », la version changeant avec les données stockées"""
+        version = hashlib.blake2b(self.signature_data.encode(), digest_size=8).hexdigest()
+        return f"{self.pk}:{version}"
+    
     def decrypt_signature(self):
-        """Déchiffre les données de signature pour utilisation"""
-        if not hasattr(settings, 'SIGNATURE_ENCRYPTION_KEY'):
-            raise ValidationError(_("Clé de chiffrement non configurée"))
-        
-        # Vérifier si les données sont chiffrées
-        if not self.signature_data.startswith('gAAAAA'):
-            print(f"DEBUG - Les données ne sont pas chiffrées pour {self.name}, retour des données brutes")
+        """Déchiffre les données de signature pour utilisation (résultat mis en cache, voir signature_cache)"""
+        # Données enregistrées avant le chiffrement : retournées telles quelles
+        if not crypto.is_encrypted(self.signature_data):
             return self.signature_data
-        
-        # S'assurer que la clé est propre (sans espaces)
-        key = settings.SIGNATURE_ENCRYPTION_KEY.strip().encode()
-        print(f"DEBUG - Longueur de la clé: {len(key)} bytes")
-        print(f"DEBUG - Clé: {key}")
-        
+        return signature_cache.get_signature_data(self.image_key, self._decrypt)
+    
+    def _decrypt(self):
         try:
-            # S'assurer que les données de signature sont propres
-            signature_data = self.signature_data.strip()
-            print(f"DEBUG - Signature data: {signature_data[:50]}...")
-            
-            f = Fernet(key)
-            decrypted_data = f.decrypt(signature_data.encode())
-            return decrypted_data.decode()
-        except Exception as e:
-            print(f"DEBUG - Erreur de déchiffrement: {str(e)}")
-            print(f"DEBUG - Type de signature_data: {type(self.signature_data)}")
-            print(f"DEBUG - Longueur de signature_data: {len(self.signature_data)}")
-            
-            # Essayer de diagnostiquer le problème
-            if len(key) != 32 and not key.endswith(b'='):
-                print("DEBUG - La clé n'est pas au format base64 valide")
-            
-            if not self.signature_data.startswith('gAAAAA'):
-                print("DEBUG - Les données de signature ne semblent pas être au format Fernet")
-            
-            raise ValidationError(_(f"Erreur lors du déchiffrement: {str(e)}"))
+            return crypto.decrypt(self.signature_data)
+        except ImproperlyConfigured as e:
+            raise ValidationError(_(str(e)))
+        except crypto.InvalidToken:
+            logger.error(f"Signature {self.pk} indéchiffrable avec les clés configurées")
+            raise ValidationError(_("Erreur lors du déchiffrement: clé de chiffrement invalide"))
     
     def mark_as_used(self):
-        """Marque la signature comme utilisée récemment"""
+        """Marque la signature comme utilisée récemment (écriture différée, voir signature_usage)"""
         self.last_used_at = timezone.now()
-        self.save(update_fields=['last_used_at'])
+        signature_usage.record_use(self.pk, self.last_used_at)
 
 class Document(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     title = models.CharField(max_length=255)
     file = models.FileField(
         upload_to='documents/',
+        storage=get_document_storage,
         validators=[validate_file_type]
     )
     uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='uploaded_documents')
@@ -172,6 +164,8 @@ class Document(models.Model):
     )
     hash = models.CharField(max_length=64, unique=True, blank=True)
     signatures = models.ManyToManyField(Signature, related_name="documents")
+    # Index de géométrie des pages (voir PDFSignatureManager.compute_page_geometry)
+    page_geometry = models.JSONField(null=True, blank=True, editable=False)
     
 
     class Meta:
@@ -182,15 +176,108 @@ class Document(models.Model):
         constraints = [ 
             models.UniqueConstraint(fields=['hash'], name='unique_document_hash')
         ]
+        indexes = [
+            # Pagination par curseur de la liste et filtre par statut (DocumentViewSet)
+            models.Index(fields=['uploaded_by', '-created_at', '-id'], name='document_owner_created_idx'),
+            models.Index(fields=['uploaded_by', 'status', '-created_at'], name='document_owner_status_idx'),
+            # Statistiques d'administration et agrégat journalier (filtre par date seule)
+            models.Index(fields=['created_at'], name='document_created_idx'),
+        ]
 
     def save(self, *args, **kwargs):
+        # Le fichier n'est écrit que s'il est chargé et compris dans update_fields
+        update_fields = kwargs.get('update_fields')
+        saves_file = 'file' not in self.get_deferred_fields() and (update_fields is None or 'file' in update_fields)
         # Generate hash based on file content if not already set
+        # (normalement déjà fourni par l'upload, voir upload_handlers.py)
         if not self.hash and self.file:
-            self.file.seek(0)  # Ensure we read the file from the beginning
-            self.hash = hashlib.sha256(self.file.read()).hexdigest()
+            self.hash = calculate_document_hash(self.file)
             self.file.seek(0)  # Reset file pointer after reading
+        # Calculer la géométrie des pages une seule fois, à l'upload
+        if self.page_geometry is None and self.file:
+            self.page_geometry = self.compute_page_geometry()
+
+        # Nom du fichier enregistré en base, lu avant l'écriture pour suivre les références
+        # des blobs du stockage adressé par contenu (la suppression est suivie par signal)
+        previous_name = None
+        if saves_file and not self._state.adding:
+            previous_name = Document.objects.filter(pk=self.pk).values_list('file', flat=True).first()
         super().save(*args, **kwargs)
 
+        if saves_file and self.file.name != previous_name:
+            add_reference(self.file.name)
+            remove_reference(previous_name)
+
+    def compute_page_geometry(self):
+        """Lit le PDF pour construire l'index de géométrie des pages"""
+        try:
+            self.file.seek(0)
+            geometry = PDFSignatureManager.compute_page_geometry(self.file)
+            self.file.seek(0)
+            return geometry
+        except Exception as e:
+            logger.error(f"Erreur lors du calcul de la géométrie du document {self.id}: {str(e)}")
+            return None
+
+    def get_page_geometry(self):
+        """Retourne l'index de géométrie, en le calculant pour les documents plus anciens"""
+        if self.page_geometry is None and self.file:
+            with self.file.open('rb'):
+                self.page_geometry = self.compute_page_geometry()
+            if self.page_geometry is not None and self.pk:
+                Document.objects.filter(pk=self.pk).update(page_geometry=self.page_geometry)
+        return self.page_geometry
+
+    def has_page(self, page):
+        """Vérifie qu'un numéro de page (0-indexed) existe, sans relire le PDF"""
+        geometry = self.get_page_geometry()
+        if geometry is None:
+            return page >= 0
+        return 0 <= page < geometry['page_count']
+
+    def signed_file_name(self):
+        """Nom du fichier signé, sans empiler les préfixes signed_signed_..."""
+        base_name = os.path.basename(self.file.name)
+        while base_name.startswith('signed_'):
+            base_name = base_name[len('signed_'):]
+        return f"signed_{base_name}"
+
+    def apply_signed_pdf(self, signed_pdf, signer, certificate, placements):
+        """
+        Enregistre le PDF signé et crée une signature par placement
+
+        Args:
+            signed_pdf (BytesIO): Contenu du PDF signé
+            signer (User): Signataire
+            certificate (Certificate): Certificat associé aux signatures
+            placements (list[dict]): signature_data, page, x, y et saved_signature_id éventuel
+
+        Returns:
+            list[Signature]: Signatures créées
+        """
+        with transaction.atomic():
+            self.file.save(self.signed_file_name(), File(signed_pdf), save=False)
+            self.status = 'signed'
+            self.save()
+
+            signatures = Signature.objects.bulk_create([
+                Signature(
+                    document=self,
+                    signer=signer,
+                    certificate=certificate,
+                    signature_data="Signature électronique",
+                    drawn_signature=placement['signature_data'],
+                    signature_position_x=placement['x'],
+                    signature_position_y=placement['y'],
+                    signature_page=placement['page'],
+                    saved_signature_id=placement.get('saved_signature_id'),
+                )
+                for placement in placements
+            ])
+        # bulk_create n'envoie pas post_save : invalider explicitement les statistiques
+        invalidate_user_stats(signer.pk)
+        return signatures
+
     def can_be_signed_by(self, user):
         return (
             self.uploaded_by == user or
@@ -223,8 +310,7 @@ class Document(models.Model):
         """Met à jour les compteurs après une signature"""
         try:
             subscription = user.subscription
-            subscription.signatures_used += 1
-            subscription.save(update_fields=['signatures_used'])
+            subscription.increment_signature_count()
         except Subscription.DoesNotExist:
             pass
     def __str__(self):
@@ -269,6 +355,12 @@ class DocumentSigner(models.Model):
         verbose_name = _('Signataire de document')
         verbose_name_plural = _('Signataires de document')
         unique_together = [['document', 'email']]
+        indexes = [
+            # Pagination par curseur des signataires d'un document (DocumentSignerViewSet)
+            models.Index(fields=['document', '-invitation_sent_at', '-id'], name='signer_document_invited_idx'),
+            # Signataires en attente d'un document (invitations, relances, statut du document)
+            models.Index(fields=['document', 'status'], name='signer_document_status_idx'),
+        ]
     
     def __str__(self):
         return f"{self.full_name} ({self.email}) - {self.get_status_display()}"
@@ -367,3 +459,195 @@ class DocumentSigner(models.Model):
         """Marquer comme refusé"""
         self.status = 'rejected'
         self.save(update_fields=['status'])
+
+
+class StoredBlob(models.Model):
+    """
+    Fichier du stockage adressé par contenu (voir documents/storage.py)
+
+    ref_count compte les documents qui pointent vers le blob ; unreferenced_at est
+    renseigné quand il n'en reste plus, pour que collect_blobs le supprime après
+    un délai de grâce.
+    """
+    digest = models.CharField(max_length=64, primary_key=True)
+    name = models.CharField(max_length=255, unique=True)
+    size = models.BigIntegerField(default=0)
+    ref_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    unreferenced_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} références)"
+
+
+class SigningJob(models.Model):
+    """
+    Travail de signature exécuté en arrière-plan par la commande run_signing_worker.
+
+    La requête HTTP se contente de valider les placements et d'enregistrer le travail ;
+    le client suit ensuite son avancement via /api/signing-jobs/<id>/.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'En attente'),
+        ('running', 'En cours'),
+        ('done', 'Terminé'),
+        ('failed', 'Échoué'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='signing_jobs')
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='signing_jobs')
+    certificate = models.ForeignKey(Certificate, on_delete=models.CASCADE)
+    # Abonnement sur lequel le quota a été réservé à l'enregistrement (rendu en cas d'échec)
+    subscription = models.ForeignKey(Subscription, on_delete=models.SET_NULL, null=True, blank=True, related_name='signing_jobs')
+    # Placements validés : page, x, y, width, height et signature_data (signature dessinée)
+    # ou saved_signature_id (déchiffrée seulement par run, jamais stockée en clair)
+    placements = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Bail du worker qui exécute le travail, prolongé tant qu'il est en vie (renew_lease)
+    locked_until = models.DateTimeField(null=True, blank=True)
+
+    # Durée par défaut du bail, en secondes
+    LEASE_SECONDS = 60
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='signingjob_status_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Travail de signature {self.id} ({self.status})"
+
+    @classmethod
+    def claim_next(cls, lease=LEASE_SECONDS):
+        """
+        Réserve le plus ancien travail en attente
+
+        La réservation est une mise à jour conditionnelle sur le statut : si plusieurs
+        workers tournent, un seul d'entre eux obtient le travail. Le worker le garde
+        pendant `lease` secondes, et doit prolonger son bail avec renew_lease.
+        """
+        for job_id in cls.objects.filter(status='pending').values_list('id', flat=True)[:10]:
+            now = timezone.now()
+            claimed = cls.objects.filter(id=job_id, status='pending').update(
+                status='running', started_at=now, locked_until=now + timezone.timedelta(seconds=lease)
+            )
+            if claimed:
+                return cls.objects.select_related('document', 'requested_by', 'certificate').get(id=job_id)
+        return None
+
+    def renew_lease(self, lease=LEASE_SECONDS):
+        """Prolonge le bail du travail en cours ; False s'il a été repris par un autre worker"""
+        self.locked_until = timezone.now() + timezone.timedelta(seconds=lease)
+        return bool(
+            SigningJob.objects.filter(id=self.id, status='running', started_at=self.started_at)
+            .update(locked_until=self.locked_until)
+        )
+
+    @classmethod
+    def requeue_stale(cls):
+        """
+        Remet en attente les travaux dont le bail a expiré (worker arrêté pendant le traitement)
+
+        Les travaux d'un worker en vie, dont le bail est prolongé, ne sont jamais repris.
+        Un travail en cours sans bail (enregistré avant son introduction) est repris
+        après une heure.
+        """
+        now = timezone.now()
+        return cls.objects.filter(status='running').filter(
+            Q(locked_until__lt=now) | Q(locked_until__isnull=True, started_at__lt=now - timezone.timedelta(hours=1))
+        ).update(status='pending', started_at=None, locked_until=None)
+
+    @staticmethod
+    def stored_placements(placements):
+        """Placements à enregistrer : les signatures sauvegardées ne gardent que leur identifiant"""
+        return [
+            {
+                key: value for key, value in placement.items()
+                if not placement.get('saved_signature_id') or key not in ('signature_data', 'image_key')
+            }
+            for placement in placements
+        ]
+
+    def resolved_placements(self):
+        """
+        Placements prêts à dessiner : les signatures sauvegardées sont relues et déchiffrées
+
+        Raises:
+            SavedSignature.DoesNotExist: si une signature a été supprimée depuis l'enregistrement
+        """
+        saved_ids = {p['saved_signature_id'] for p in self.placements if p.get('saved_signature_id')}
+        saved_signatures = {
+            str(saved_signature.id): saved_signature
+            for saved_signature in SavedSignature.objects.filter(id__in=saved_ids, user_id=self.requested_by_id)
+        }
+        placements = []
+        for placement in self.placements:
+            saved_signature_id = placement.get('saved_signature_id')
+            if saved_signature_id:
+                saved_signature = saved_signatures.get(saved_signature_id)
+                if saved_signature is None:
+                    raise SavedSignature.DoesNotExist(f"Signature sauvegardée {saved_signature_id} introuvable")
+                placement = {
+                    **placement,
+                    'signature_data': saved_signature.decrypt_signature(),
+                    'image_key': saved_signature.image_key,
+                }
+            placements.append(placement)
+        return placements
+
+    def owned(self):
+        """Travaux encore détenus par ce worker : started_at identifie la réservation"""
+        return SigningJob.objects.filter(id=self.id, status='running', started_at=self.started_at)
+
+    def run(self):
+        """
+        Signe le document et enregistre le résultat (appelé par le worker)
+
+        Le résultat n'est appliqué que si le worker détient encore le travail : le passage
+        à 'done' est une mise à jour conditionnelle sur la réservation, faite dans la même
+        transaction que l'enregistrement du PDF signé. Un travail repris par un autre
+        worker (bail expiré, voir requeue_stale) est abandonné sans effet.
+        """
+        try:
+            placements = self.resolved_placements()
+            with self.document.file.open('rb') as pdf_file:
+                signed_pdf = PDFSignatureManager.sign_pdf_batch(pdf_file, [
+                    {
+                        key: placement[key]
+                        for key in ('signature_data', 'page', 'x', 'y', 'width', 'height', 'image_key')
+                        if key in placement
+                    }
+                    for placement in placements
+                ])
+
+            finished_at = timezone.now()
+            with transaction.atomic():
+                if not self.owned().update(status='done', finished_at=finished_at, locked_until=None):
+                    logger.warning(f"Travail de signature {self.id} repris par un autre worker, résultat abandonné")
+                    self.refresh_from_db()
+                    return
+                self.document.apply_signed_pdf(signed_pdf, self.requested_by, self.certificate, placements)
+
+            saved_signature_ids = {p['saved_signature_id'] for p in self.placements if p.get('saved_signature_id')}
+            if saved_signature_ids:
+                SavedSignature.objects.filter(id__in=saved_signature_ids).update(last_used_at=finished_at)
+
+            self.status, self.finished_at, self.locked_until = 'done', finished_at, None
+            logger.info(f"Travail de signature {self.id} terminé ({len(self.placements)} signatures)")
+        except Exception as e:
+            logger.error(f"Erreur lors du travail de signature {self.id}: {str(e)}")
+            finished_at = timezone.now()
+            # Le quota n'est rendu que par le worker qui détient encore le travail
+            if not self.owned().update(status='failed', error=str(e), finished_at=finished_at, locked_until=None):
+                logger.warning(f"Travail de signature {self.id} repris par un autre worker, échec ignoré")
+                self.refresh_from_db()
+                return
+            self.status, self.error, self.finished_at, self.locked_until = 'failed', str(e), finished_at, None
+            if self.subscription_id:
+                QuotaService.refund(self.subscription_id, len(self.placements))
@@ -0,0 +1,272 @@
+import re
+import zlib
+from io import BytesIO
+
+from PyPDF2 import PdfReader
+from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject, NumberObject
+import logging
+
+# Configurer le logger
+logger = logging.getLogger(__name__)
+
+
+class IncrementalUpdateError(Exception):
+    """Le document ne peut pas être mis à jour de manière incrémentale"""
+
+
+class IncrementalPDFUpdater:
+    """
+    Ajoute des signatures à un PDF par mise à jour incrémentale (append-only).
+
+    Les octets du document original sont conservés tels quels : seuls l'image de
+    signature, les flux de contenu ajoutés, les dictionnaires de pages modifiés et
+    une nouvelle section xref sont écrits à la fin du fichier. Le coût d'une
+    signature ne dépend donc plus de la taille du document, et les plages d'octets
+    déjà signées restent intactes.
+    """
+
+    def __init__(self, pdf_bytes):
+        self.original = bytes(pdf_bytes)
+        self.reader = PdfReader(BytesIO(self.original))
+        if self.reader.is_encrypted:
+            raise IncrementalUpdateError("Les PDF chiffrés ne sont pas pris en charge")
+
+        self.prev_xref = self._find_startxref()
+        self.uses_xref_stream = not self.original[self.prev_xref:self.prev_xref + 4] == b'xref'
+        self.next_id = self._get_size()
+        # {numéro d'objet: (génération, octets sérialisés)}
+        self.objects = {}
+        # {index de page: (page originale, dictionnaire de page modifié)}
+        self.pages = {}
+        # {clé d'image: référence du XObject déjà intégré}
+        self.images = {}
+
+    def _find_startxref(self):
+        position = self.original.rfind(b'startxref')
+        if position < 0:
+            raise IncrementalUpdateError("Mot-clé startxref introuvable")
+        match = re.match(rb'startxref\s+(\d+)', self.original[position:])
+        if not match:
+            raise IncrementalUpdateError("Offset startxref invalide")
+        return int(match.group(1))
+
+    def _get_size(self):
+        """Premier numéro d'objet libre (PyPDF2 ne conserve pas toujours /Size des flux xref)"""
+        known_ids = list(self.reader.xref_objStm)
+        for entries in self.reader.xref.values():
+            known_ids.extend(entries)
+        return max([int(self.reader.trailer.get('/Size', 0))] + [object_id + 1 for object_id in known_ids])
+
+    def _allocate(self):
+        object_id = self.next_id
+        self.next_id += 1
+        return object_id
+
+    def _add_stream(self, dictionary, data):
+        """Enregistre un nouvel objet flux et retourne sa référence indirecte"""
+        object_id = self._allocate()
+        header = BytesIO()
+        dictionary[NameObject('/Length')] = _number(len(data))
+        dictionary.write_to_stream(header, None)
+        self.objects[object_id] = (0, header.getvalue() + b'\nstream\n' + data + b'\nendstream')
+        return IndirectObject(object_id, 0, self.reader)
+
+    def _add_image(self, image):
+        """Ajoute l'image de signature comme XObject image (avec masque alpha si nécessaire)"""
+        image = image.convert('RGBA')
+        width, height = image.size
+        alpha = image.getchannel('A')
+
+        dictionary = DictionaryObject({
+            NameObject('/Type'): NameObject('/XObject'),
+            NameObject('/Subtype'): NameObject('/Image'),
+            NameObject('/Width'): _number(width),
+            NameObject('/Height'): _number(height),
+            NameObject('/ColorSpace'): NameObject('/DeviceRGB'),
+            NameObject('/BitsPerComponent'): _number(8),
+            NameObject('/Filter'): NameObject('/FlateDecode'),
+        })
+        if alpha.getextrema() != (255, 255):
+            dictionary[NameObject('/SMask')] = self._add_stream(DictionaryObject({
+                NameObject('/Type'): NameObject('/XObject'),
+                NameObject('/Subtype'): NameObject('/Image'),
+                NameObject('/Width'): _number(width),
+                NameObject('/Height'): _number(height),
+                NameObject('/ColorSpace'): NameObject('/DeviceGray'),
+                NameObject('/BitsPerComponent'): _number(8),
+                NameObject('/Filter'): NameObject('/FlateDecode'),
+            }), zlib.compress(alpha.tobytes()))
+
+        return self._add_stream(dictionary, zlib.compress(image.convert('RGB').tobytes()))
+
+    def _get_page(self, page):
+        """Retourne la copie modifiable du dictionnaire de la page (une seule par page)"""
+        if page not in self.pages:
+            page_obj = self.reader.pages[page]
+            new_page = _copy_dictionary(page_obj)
+
+            # Les ressources peuvent être indirectes (PdfReader recopie déjà les
+            # attributs hérités sur la page) : on les recopie en ligne sur la page
+            resources = _copy_dictionary(page_obj.get('/Resources'))
+            resources[NameObject('/XObject')] = _copy_dictionary(resources.get('/XObject'))
+            new_page[NameObject('/Resources')] = resources
+
+            # Isoler le contenu original pour qu'un état graphique non restauré
+            # n'affecte pas la position de la signature
+            contents = page_obj.raw_get('/Contents') if '/Contents' in page_obj else None
+            if isinstance(contents, IndirectObject) and isinstance(contents.get_object(), ArrayObject):
+                contents = contents.get_object()
+            if contents is None:
+                original_contents = []
+            elif isinstance(contents, ArrayObject):
+                original_contents = list(contents)
+            else:
+                original_contents = [contents]
+            new_page[NameObject('/Contents')] = ArrayObject(
+                [self._add_stream(DictionaryObject(), b'q')] + original_contents
+                + [self._add_stream(DictionaryObject(), b'Q')]
+            )
+
+            self.pages[page] = (page_obj, new_page)
+        return self.pages[page]
+
+    def add_image(self, page, image, x, y, width, height, image_key=None):
+        """
+        Dessine une image sur une page (coordonnées avec origine en haut à gauche)
+
+        Args:
+            page (int): Numéro de page (0-indexed)
+            image (PIL.Image.Image): Image de signature décodée
+            x, y, width, height: Position et taille de la signature en points
+            image_key (optional): Clé permettant de réutiliser une image déjà intégrée
+        """
+        # Import local : pdf_signer importe ce module
+        from .pdf_signer import PDFSignatureManager
+
+        page_obj, new_page = self._get_page(page)
+        # Position relative à la zone visible (cropbox) de la page affichée, /Rotate compris
+        matrix = PDFSignatureManager.placement_matrix(PDFSignatureManager.page_box(page_obj), x, y, width, height)
+
+        xobjects = new_page['/Resources']['/XObject']
+        index = len(xobjects)
+        while f'/WSig{index}' in xobjects:
+            index += 1
+        name = f'/WSig{index}'
+        if image_key is None or image_key not in self.images:
+            reference = self._add_image(image)
+            if image_key is not None:
+                self.images[image_key] = reference
+        else:
+            reference = self.images[image_key]
+        xobjects[NameObject(name)] = reference
+
+        operators = f"q {' '.join(_format(value) for value in matrix)} cm {name} Do Q"
+        new_page['/Contents'].append(self._add_stream(DictionaryObject(), operators.encode()))
+
+        logger.debug(f"Signature incrémentale: page={page}, x={x}, y={y}, matrix={matrix}, width={width}, height={height}")
+
+    def write(self, stream):
+        """Écrit le document original suivi de la section de mise à jour"""
+        for page_obj, new_page in self.pages.values():
+            reference = page_obj.indirect_reference
+            body = BytesIO()
+            new_page.write_to_stream(body, None)
+            self.objects[reference.idnum] = (reference.generation, body.getvalue())
+
+        stream.write(self.original)
+        offset = len(self.original)
+        if not self.original.endswith(b'\n'):
+            stream.write(b'\n')
+            offset += 1
+
+        offsets = {}
+        for object_id in sorted(self.objects):
+            generation, body = self.objects[object_id]
+            chunk = f'{object_id} {generation} obj\n'.encode() + body + b'\nendobj\n'
+            offsets[object_id] = (offset, generation)
+            stream.write(chunk)
+            offset += len(chunk)
+
+        if self.uses_xref_stream:
+            self._write_xref_stream(stream, offsets, offset)
+        else:
+            self._write_xref_table(stream, offsets, offset)
+
+    def _trailer_entries(self, size):
+        trailer = DictionaryObject({
+            NameObject('/Size'): _number(size),
+            NameObject('/Root'): self.reader.trailer.raw_get('/Root'),
+            NameObject('/Prev'): _number(self.prev_xref),
+        })
+        for key in ('/Info', '/ID'):
+            if key in self.reader.trailer:
+                trailer[NameObject(key)] = self.reader.trailer.raw_get(key)
+        return trailer
+
+    def _write_xref_table(self, stream, offsets, xref_offset):
+        lines = [b'xref\n']
+        for start, ids in _subsections(sorted(offsets)):
+            lines.append(f'{start} {len(ids)}\n'.encode())
+            for object_id in ids:
+                position, generation = offsets[object_id]
+                lines.append(f'{position:010d} {generation:05d} n \n'.encode())
+        lines.append(b'trailer\n')
+        trailer = BytesIO()
+        self._trailer_entries(self.next_id).write_to_stream(trailer, None)
+        lines.append(trailer.getvalue())
+        lines.append(f'\nstartxref\n{xref_offset}\n%%EOF\n'.encode())
+        stream.write(b''.join(lines))
+
+    def _write_xref_stream(self, stream, offsets, xref_offset):
+        xref_id = self._allocate()
+        offsets[xref_id] = (xref_offset, 0)
+
+        index = ArrayObject()
+        rows = []
+        for start, ids in _subsections(sorted(offsets)):
+            index.extend([_number(start), _number(len(ids))])
+            for object_id in ids:
+                position, generation = offsets[object_id]
+                rows.append(b'\x01' + position.to_bytes(4, 'big') + generation.to_bytes(2, 'big'))
+        data = b''.join(rows)
+
+        dictionary = self._trailer_entries(self.next_id)
+        dictionary[NameObject('/Type')] = NameObject('/XRef')
+        dictionary[NameObject('/W')] = ArrayObject([_number(1), _number(4), _number(2)])
+        dictionary[NameObject('/Index')] = index
+        dictionary[NameObject('/Length')] = _number(len(data))
+        header = BytesIO()
+        dictionary.write_to_stream(header, None)
+
+        stream.write(f'{xref_id} 0 obj\n'.encode() + header.getvalue() + b'\nstream\n' + data
+                     + f'\nendstream\nendobj\nstartxref\n{xref_offset}\n%%EOF\n'.encode())
+
+
+def _number(value):
+    return NumberObject(value)
+
+
+def _copy_dictionary(dictionary):
+    """Copie superficielle d'un dictionnaire PDF en conservant les références indirectes"""
+    copy = DictionaryObject()
+    if isinstance(dictionary, IndirectObject):
+        dictionary = dictionary.get_object()
+    for key in (dictionary or {}).keys():
+        copy[NameObject(key)] = dictionary.raw_get(key)
+    return copy
+
+
+def _format(value):
+    return f'{float(value):.4f}'.rstrip('0').rstrip('.')
+
+
+def _subsections(ids):
+    """Regroupe des numéros d'objets triés en sous-sections contiguës"""
+    group = []
+    for object_id in ids:
+        if group and object_id != group[-1] + 1:
+            yield group[0], group
+            group = []
+        group.append(object_id)
+    if group:
+        yield group[0], group
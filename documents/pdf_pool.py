@@ -0,0 +1,166 @@
+"""
+Pool de processus borné pour le travail PDF (analyse, fusion, écriture).
+
+Le traitement PDF est du Python pur lié au CPU : exécuté dans les threads gunicorn,
+il bloque la requête et, à cause du GIL, ralentit l'autre thread du worker. Les
+travaux sont donc soumis à un pool de processus de taille fixe, avec une file
+d'attente bornée : au-delà, PDFWorkerBusy est levée immédiatement (la vue répond
+503) au lieu d'accumuler des requêtes lentes au-delà du proxy_read_timeout de nginx.
+
+Paramètres (settings) :
+- PDF_WORKER_PROCESSES : nombre de processus par worker gunicorn (0 = exécution directe)
+- PDF_WORKER_MAX_PENDING : nombre maximal de travaux en cours ou en attente
+- PDF_WORKER_TIMEOUT : délai maximal d'un travail, en secondes
+
+Un processus ne peut pas interrompre le travail qu'il exécute : quand un travail en
+cours dépasse PDF_WORKER_TIMEOUT, le pool est remplacé (shutdown sans attente) et
+l'emplacement du travail est libéré. Les nouveaux travaux partent sur un pool neuf ;
+l'ancien termine ses travaux en cours puis s'arrête, et ses travaux encore en
+attente sont annulés (PDFWorkerBusy, réponse 503).
+"""
+import multiprocessing
+import threading
+from io import BytesIO
+from concurrent.futures import CancelledError, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from django.conf import settings
+import logging
+
+from .pdf_signer import PDFSignatureManager
+
+# Configurer le logger
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_executor = None
+_slots = None
+
+
+class PDFWorkerUnavailable(Exception):
+    """Le travail PDF n'a pas pu être exécuté par le pool"""
+
+
+class PDFWorkerBusy(PDFWorkerUnavailable):
+    """Le pool est saturé : aucun emplacement libre dans la file d'attente"""
+
+
+class PDFWorkerTimeout(PDFWorkerUnavailable):
+    """Le travail PDF a dépassé le délai configuré"""
+
+
+def _get_pool():
+    """Crée le pool et le sémaphore de la file d'attente au premier appel (un par processus)"""
+    global _executor, _slots
+    with _lock:
+        if _executor is None:
+            processes = getattr(settings, 'PDF_WORKER_PROCESSES', 2)
+            max_pending = getattr(settings, 'PDF_WORKER_MAX_PENDING', processes * 2)
+            # forkserver évite de dupliquer l'état des threads du worker gunicorn
+            context = multiprocessing.get_context(
+                'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            )
+            _executor = ProcessPoolExecutor(max_workers=processes, mp_context=context)
+            _slots = threading.BoundedSemaphore(max_pending)
+            logger.info(f"Pool PDF démarré: {processes} processus, {max_pending} travaux maximum")
+        return _executor, _slots
+
+
+def _reset_pool(executor):
+    """
+    Remplace un pool cassé (processus enfant tué) ou bloqué par un travail trop long
+
+    Les travaux en cours de l'ancien pool se terminent normalement ; ceux encore en
+    attente sont annulés.
+    """
+    global _executor
+    with _lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def run_pdf_job(func, *args, timeout=None):
+    """
+    Exécute une fonction PDF dans le pool de processus
+
+    Args:
+        func (callable): Fonction importable au niveau module (sérialisable par pickle)
+        *args: Arguments sérialisables de la fonction
+        timeout (float, optional): Délai maximal en secondes (PDF_WORKER_TIMEOUT par défaut)
+
+    Returns:
+        Résultat de la fonction
+
+    Raises:
+        PDFWorkerBusy: Si la file d'attente est pleine
+        PDFWorkerTimeout: Si le travail n'est pas terminé dans le délai
+    """
+    if getattr(settings, 'PDF_WORKER_PROCESSES', 2) <= 0:
+        return func(*args)
+
+    if timeout is None:
+        timeout = getattr(settings, 'PDF_WORKER_TIMEOUT', 20)
+
+    executor, slots = _get_pool()
+    if not slots.acquire(blocking=False):
+        logger.warning("Pool PDF saturé, travail refusé")
+        raise PDFWorkerBusy("Le service de signature est saturé")
+
+    released = threading.Lock()
+
+    def release_slot(_=None):
+        # Appelé à la fin du travail ou à son abandon : seul le premier appel libère
+        if released.acquire(blocking=False):
+            slots.release()
+
+    try:
+        future = executor.submit(func, *args)
+    except BrokenProcessPool:
+        release_slot()
+        _reset_pool(executor)
+        raise PDFWorkerUnavailable("Le pool de traitement PDF a été réinitialisé")
+    except RuntimeError:
+        # Pool arrêté entre _get_pool et submit (remplacé après un timeout)
+        release_slot()
+        raise PDFWorkerBusy("Le service de signature est saturé")
+    except Exception:
+        release_slot()
+        raise
+    future.add_done_callback(release_slot)
+
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeoutError:
+        # cancel() n'agit que sur un travail encore en attente ; un travail en cours
+        # occupe son processus jusqu'au bout : le pool est remplacé
+        if not future.cancel():
+            _reset_pool(executor)
+            release_slot()
+        logger.error(f"Travail PDF interrompu après {timeout}s")
+        raise PDFWorkerTimeout("Le traitement du document a pris trop de temps")
+    except CancelledError:
+        # Travail en attente annulé par le remplacement du pool
+        raise PDFWorkerBusy("Le service de signature est saturé")
+    except BrokenProcessPool:
+        _reset_pool(executor)
+        raise PDFWorkerUnavailable("Le pool de traitement PDF a été réinitialisé")
+
+
+def _sign_pdf_batch_job(pdf_bytes, placements):
+    """Travail exécuté dans un processus du pool : retourne les octets du PDF signé"""
+    return PDFSignatureManager.sign_pdf_batch(BytesIO(pdf_bytes), placements).getvalue()
+
+
+def sign_pdf_batch(pdf_bytes, placements, timeout=None):
+    """
+    Place des signatures sur un PDF dans le pool de processus
+
+    Args:
+        pdf_bytes (bytes): Contenu du document PDF
+        placements (list[dict]): signature_data, page, x, y, width, height
+        timeout (float, optional): Délai maximal en secondes
+
+    Returns:
+        BytesIO: Contenu du PDF signé, positionné au début
+    """
+    return BytesIO(run_pdf_job(_sign_pdf_batch_job, pdf_bytes, placements, timeout=timeout))
@@ -1,12 +1,16 @@
 import os
 from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2.generic import RectangleObject
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
+from reportlab.lib.utils import ImageReader
 from io import BytesIO
 import base64
 from django.conf import settings
 import uuid
 import logging
+from .pdf_incremental import IncrementalPDFUpdater, IncrementalUpdateError
+from . import signature_cache
 
 # Configurer le logger
 logger = logging.getLogger(__name__)
@@ -54,17 +58,26 @@ class PDFSignatureManager:
             raise
 
     @staticmethod
-    def get_pdf_dimensions(pdf_path, page_num=0):
+    def get_pdf_dimensions(pdf_path, page_num=0, geometry=None):
         """
         Obtient les dimensions d'une page de PDF
         
         Args:
             pdf_path (str): Chemin du document PDF
             page_num (int): Numéro de page (0-indexed)
+            geometry (dict, optional): Index de géométrie déjà calculé (voir compute_page_geometry),
+                utilisé à la place d'une nouvelle lecture du PDF
             
         Returns:
             tuple: (largeur, hauteur) de la page en points
         """
+        if geometry:
+            if page_num < 0 or page_num >= geometry['page_count']:
+                logger.warning(f"Numéro de page invalide: {page_num}. Utilisation de la première page.")
+                page_num = 0
+            x0, y0, x1, y1 = PDFSignatureManager.get_page_box(geometry, page_num)['mediabox']
+            return (x1 - x0, y1 - y0)
+        
         try:
             pdf = PdfReader(pdf_path)
             if page_num >= len(pdf.pages):
@@ -83,6 +96,108 @@ class PDFSignatureManager:
             # Retourner les dimensions par défaut de letter
             return (612, 792)  # 8.5 x 11 pouces en points
 
+    @staticmethod
+    def compute_page_geometry(pdf_file):
+        """
+        Calcule l'index de géométrie des pages d'un PDF en une seule lecture
+        
+        Les géométries distinctes sont stockées une seule fois dans "boxes" et les pages
+        consécutives de même géométrie sont regroupées dans "runs" ([première page,
+        nombre de pages, index dans boxes]) : un document de 500 pages A4 tient en une entrée.
+        
+        Args:
+            pdf_file (str | file-like): Chemin ou flux binaire du document PDF
+        
+        Returns:
+            dict: {"page_count": int, "boxes": [...], "runs": [[first, count, box], ...]}
+        """
+        reader = PdfReader(pdf_file)
+        boxes = []
+        runs = []
+        for index, page in enumerate(reader.pages):
+            box = PDFSignatureManager.page_box(page)
+            if box in boxes:
+                box_index = boxes.index(box)
+            else:
+                boxes.append(box)
+                box_index = len(boxes) - 1
+            
+            if runs and runs[-1][2] == box_index and runs[-1][0] + runs[-1][1] == index:
+                runs[-1][1] += 1
+            else:
+                runs.append([index, 1, box_index])
+        
+        return {'page_count': len(reader.pages), 'boxes': boxes, 'runs': runs}
+
+    @staticmethod
+    def page_box(page_obj):
+        """
+        Géométrie d'une page PyPDF2 au format de l'index (mediabox, cropbox, rotation)
+        
+        Args:
+            page_obj (PageObject): Page du document
+        
+        Returns:
+            dict: {"mediabox": [x0, y0, x1, y1], "cropbox": [...], "rotation": 0|90|180|270}
+        """
+        return {
+            'mediabox': [float(value) for value in page_obj.mediabox],
+            'cropbox': [float(value) for value in page_obj.cropbox],
+            'rotation': int(page_obj.get('/Rotate', 0) or 0) % 360,
+        }
+
+    @staticmethod
+    def placement_matrix(box, x, y, width, height):
+        """
+        Matrice PDF (a, b, c, d, e, f) qui dessine une image unité à l'emplacement demandé
+        
+        Les coordonnées du placement sont celles de la page telle qu'affichée : origine
+        en haut à gauche de la cropbox (zone visible), après la rotation /Rotate.
+        L'image reste droite à l'affichage quelle que soit la rotation de la page.
+        
+        Args:
+            box (dict): Géométrie de la page (voir page_box)
+            x, y, width, height: Position et taille de la signature en points
+        
+        Returns:
+            tuple: Opérandes de l'opérateur cm
+        """
+        x0, y0, x1, y1 = box['cropbox']
+        # Origine de l'affichage et vecteurs unitaires des axes affichés (vers la droite,
+        # vers le bas) dans l'espace utilisateur de la page, /Rotate tournant dans le sens horaire
+        origin, right, down = {
+            0: ((x0, y1), (1, 0), (0, -1)),
+            90: ((x0, y0), (0, 1), (1, 0)),
+            180: ((x1, y0), (-1, 0), (0, 1)),
+            270: ((x1, y1), (0, -1), (-1, 0)),
+        }.get(box.get('rotation', 0), ((x0, y1), (1, 0), (0, -1)))
+        
+        # Coin inférieur gauche de l'image à l'affichage : (x, y + height)
+        e = origin[0] + x * right[0] + (y + height) * down[0]
+        f = origin[1] + x * right[1] + (y + height) * down[1]
+        return (
+            width * right[0], width * right[1],
+            -height * down[0], -height * down[1],
+            e, f,
+        )
+
+    @staticmethod
+    def get_page_box(geometry, page):
+        """
+        Retourne la géométrie (mediabox, cropbox, rotation) d'une page depuis l'index
+        
+        Args:
+            geometry (dict): Index calculé par compute_page_geometry
+            page (int): Numéro de page (0-indexed)
+        
+        Returns:
+            dict | None: Géométrie de la page, None si la page n'existe pas
+        """
+        for first, count, box_index in geometry['runs']:
+            if first <= page < first + count:
+                return geometry['boxes'][box_index]
+        return None
+
     @staticmethod
     def add_signature_to_pdf(pdf_path, signature_path, output_path=None, page=0, x=100, y=100, width=200, height=100):
         """
@@ -110,32 +225,6 @@ class PDFSignatureManager:
                 # S'assurer que le répertoire existe
                 os.makedirs(os.path.dirname(output_path), exist_ok=True)
             
-            # Obtenir les dimensions du PDF
-            pdf_width, pdf_height = PDFSignatureManager.get_pdf_dimensions(pdf_path, page)
-            
-            # Créer un PDF temporaire avec la signature
-            packet = BytesIO()
-            c = canvas.Canvas(packet, pagesize=(pdf_width, pdf_height))
-            
-            # Ajuster les coordonnées Y (dans PDF, l'origine est en bas à gauche)
-            # Alors que dans la plupart des interfaces utilisateur, l'origine est en haut à gauche
-            adjusted_y = pdf_height - y - height
-            
-            # Dessiner l'image de signature
-            c.drawImage(signature_path, x, adjusted_y, width, height, mask='auto')
-            
-            # Ajouter des informations de débogage
-            logger.debug(f"PDF dimensions: {pdf_width}x{pdf_height}")
-            logger.debug(f"Signature position: x={x}, y={y}, adjusted_y={adjusted_y}, width={width}, height={height}")
-            
-            c.save()
-            
-            # Déplacer au début du BytesIO
-            packet.seek(0)
-            
-            # Créer un nouveau PDF avec la signature
-            new_pdf = PdfReader(packet)
-            
             # Lire le PDF existant
             existing_pdf = PdfReader(pdf_path)
             output = PdfWriter()
@@ -145,10 +234,17 @@ class PDFSignatureManager:
                 logger.warning(f"Numéro de page invalide: {page}. Utilisation de la première page.")
                 page = 0
             
+            # Créer la page de superposition avec la signature, selon la géométrie de la page
+            box = PDFSignatureManager.page_box(existing_pdf.pages[page])
+            x0, y0, x1, y1 = box['mediabox']
+            overlay = PDFSignatureManager.create_overlay_page(
+                x1 - x0, y1 - y0, signature_path, x, y, width, height, box=box
+            )
+            
             # Ajouter la signature à la page spécifiée
             for i, page_obj in enumerate(existing_pdf.pages):
                 if i == page:
-                    page_obj.merge_page(new_pdf.pages[0])
+                    page_obj.merge_page(overlay)
                 output.add_page(page_obj)
             
             # Écrire le PDF de sortie
@@ -178,6 +274,7 @@ class PDFSignatureManager:
         Returns:
             str: Chemin du PDF signé
         """
+        signature_path = None
         try:
             # Créer l'image de signature
             signature_path = PDFSignatureManager.create_signature_image(signature_data)
@@ -190,15 +287,289 @@ class PDFSignatureManager:
                 pdf_path, signature_path, output_path, page, x, y, width, height
             )
             
-            # Supprimer l'image de signature temporaire
-            os.remove(signature_path)
-            
             return signed_pdf_path
         except Exception as e:
             logger.error(f"Erreur lors de la signature du PDF: {str(e)}")
             raise
+        finally:
+            # Supprimer l'image de signature temporaire, même en cas d'échec
+            if signature_path and os.path.exists(signature_path):
+                os.remove(signature_path)
+
+    @staticmethod
+    def load_signature_image(signature_data):
+        """
+        Décode les données de signature base64 en image utilisable par reportlab,
+        sans passer par le disque
+        
+        Args:
+            signature_data (str): Données de signature en base64
+        
+        Returns:
+            ImageReader: Image de signature prête à être dessinée
+        """
+        try:
+            return ImageReader(BytesIO(PDFSignatureManager.decode_signature_data(signature_data)))
+        except Exception as e:
+            logger.error(f"Erreur lors du décodage de l'image de signature: {str(e)}")
+            raise
+
+    @staticmethod
+    def decode_signature_data(signature_data):
+        """
+        Décode les données de signature base64 (avec ou sans préfixe data URL)
+        
+        Args:
+            signature_data (str): Données de signature en base64
+        
+        Returns:
+            bytes: Contenu binaire de l'image
+        """
+        if "data:image" in signature_data:
+            # Supprimer le préfixe data:image/png;base64,
+            signature_data = signature_data.split(",")[1]
+        
+        return base64.b64decode(signature_data)
+
+    @staticmethod
+    def create_overlay_page(pdf_width, pdf_height, signature_image, x, y, width, height, box=None):
+        """
+        Construit en mémoire la page PDF contenant uniquement la signature
+        
+        Args:
+            pdf_width (float): Largeur de la page cible en points
+            pdf_height (float): Hauteur de la page cible en points
+            signature_image (str | ImageReader): Chemin ou image de la signature
+            x, y, width, height: Position et taille de la signature (origine en haut à gauche)
+            box (dict, optional): Géométrie de la page cible (voir page_box)
+        
+        Returns:
+            PageObject: Page de superposition à fusionner
+        """
+        return PDFSignatureManager.create_batch_overlay_page(
+            pdf_width, pdf_height, [(signature_image, x, y, width, height)], box=box
+        )
+
+    @staticmethod
+    def create_batch_overlay_page(pdf_width, pdf_height, drawings, box=None):
+        """
+        Construit en mémoire une seule page de superposition contenant plusieurs signatures
+        
+        Args:
+            pdf_width (float): Largeur de la page cible en points
+            pdf_height (float): Hauteur de la page cible en points
+            drawings (list): Tuples (image, x, y, width, height), origine en haut à gauche
+            box (dict, optional): Géométrie de la page cible (voir page_box) ; par défaut,
+                page sans rotation de mediabox [0, 0, pdf_width, pdf_height]
+        
+        Returns:
+            PageObject: Page de superposition à fusionner
+        """
+        if box is None:
+            box = {
+                'mediabox': [0, 0, pdf_width, pdf_height],
+                'cropbox': [0, 0, pdf_width, pdf_height],
+                'rotation': 0,
+            }
+        
+        packet = BytesIO()
+        c = canvas.Canvas(packet, pagesize=(pdf_width, pdf_height))
+        
+        for signature_image, x, y, width, height in drawings:
+            # Dans PDF, l'origine est en bas à gauche : la matrice tient compte de la
+            # cropbox et de la rotation de la page
+            matrix = PDFSignatureManager.placement_matrix(box, x, y, width, height)
+            c.saveState()
+            c.transform(*matrix)
+            c.drawImage(signature_image, 0, 0, 1, 1, mask='auto')
+            c.restoreState()
+            logger.debug(f"Signature position: x={x}, y={y}, matrix={matrix}, width={width}, height={height}")
+        
+        logger.debug(f"PDF dimensions: {pdf_width}x{pdf_height}")
+        
+        c.save()
+        packet.seek(0)
+        overlay = PdfReader(packet).pages[0]
+        # merge_page découpe la superposition à sa propre boîte : reprendre celle de la page
+        overlay.mediabox = RectangleObject(box['mediabox'])
+        return overlay
+
+    @staticmethod
+    def _read_pdf_bytes(pdf_file):
+        """Lit le contenu binaire d'un PDF donné par chemin ou par flux"""
+        if isinstance(pdf_file, (str, os.PathLike)):
+            with open(pdf_file, 'rb') as f:
+                return f.read()
+        return pdf_file.read()
+
+    @staticmethod
+    def _group_placements(placements, page_count):
+        """
+        Regroupe les placements par page en validant les numéros de page
+        
+        Returns:
+            dict: {page: [placement, ...]} dans l'ordre des placements
+        """
+        by_page = {}
+        for placement in placements:
+            page = int(placement.get('page', 0))
+            if page < 0 or page >= page_count:
+                logger.warning(f"Numéro de page invalide: {page}. Utilisation de la première page.")
+                page = 0
+            by_page.setdefault(page, []).append(placement)
+        return by_page
+
+    @staticmethod
+    def sign_pdf_in_memory(pdf_file, signature_data, page=0, x=100, y=100, width=200, height=100):
+        """
+        Signe un PDF entièrement en mémoire : aucune image ni PDF temporaire
+        n'est écrit sur le disque
+        
+        Args:
+            pdf_file (str | file-like): Chemin ou flux binaire du document PDF
+            signature_data (str): Données de signature en base64
+            page (int, optional): Numéro de page où ajouter la signature (0-indexed)
+            x, y, width, height: Position et taille de la signature
+        
+        Returns:
+            BytesIO: Contenu du PDF signé, positionné au début
+        """
+        logger.info(f"Coordonnées reçues: page={page}, x={x}, y={y}, width={width}, height={height}")
+        return PDFSignatureManager.rewrite_pdf_batch(pdf_file, [{
+            'signature_data': signature_data, 'page': page,
+            'x': x, 'y': y, 'width': width, 'height': height,
+        }])
+
+    @staticmethod
+    def rewrite_pdf_batch(pdf_file, placements):
+        """
+        Place plusieurs signatures en réécrivant entièrement le PDF en mémoire,
+        avec une seule page de superposition par page concernée
+        
+        Args:
+            pdf_file (str | file-like): Chemin ou flux binaire du document PDF
+            placements (list[dict]): signature_data, page, x, y, width, height
+        
+        Returns:
+            BytesIO: Contenu du PDF signé, positionné au début
+        """
+        try:
+            existing_pdf = PdfReader(pdf_file)
+            by_page = PDFSignatureManager._group_placements(placements, len(existing_pdf.pages))
+            
+            # Chaque image n'est décodée qu'une fois, même si elle est placée plusieurs fois ;
+            # les signatures sauvegardées (image_key) restent décodées d'un appel à l'autre
+            images = {}
+            overlays = {}
+            for page, page_placements in by_page.items():
+                drawings = []
+                for placement in page_placements:
+                    signature_data = placement['signature_data']
+                    if signature_data not in images:
+                        images[signature_data] = ImageReader(
+                            signature_cache.get_signature_image(placement.get('image_key'), signature_data)
+                        )
+                    drawings.append((
+                        images[signature_data], placement['x'], placement['y'],
+                        placement['width'], placement['height']
+                    ))
+                # La géométrie est lue sur le document déjà chargé
+                box = PDFSignatureManager.page_box(existing_pdf.pages[page])
+                x0, y0, x1, y1 = box['mediabox']
+                overlays[page] = PDFSignatureManager.create_batch_overlay_page(
+                    x1 - x0, y1 - y0, drawings, box=box
+                )
+            
+            output = PdfWriter()
+            for i, page_obj in enumerate(existing_pdf.pages):
+                if i in overlays:
+                    page_obj.merge_page(overlays[i])
+                output.add_page(page_obj)
+            
+            signed_pdf = BytesIO()
+            output.write(signed_pdf)
+            signed_pdf.seek(0)
+            return signed_pdf
+        except Exception as e:
+            logger.error(f"Erreur lors de la signature du PDF en mémoire: {str(e)}")
+            raise
+
+    @staticmethod
+    def sign_pdf_incremental(pdf_file, signature_data, page=0, x=100, y=100, width=200, height=100):
+        """
+        Signe un PDF par mise à jour incrémentale : les octets originaux sont conservés
+        et seuls la signature, la page modifiée et une nouvelle section xref sont ajoutés
+        
+        Args:
+            pdf_file (str | file-like): Chemin ou flux binaire du document PDF
+            signature_data (str): Données de signature en base64
+            page (int, optional): Numéro de page où ajouter la signature (0-indexed)
+            x, y, width, height: Position et taille de la signature
+        
+        Returns:
+            BytesIO: Contenu du PDF signé, positionné au début
+        """
+        logger.info(f"Coordonnées reçues: page={page}, x={x}, y={y}, width={width}, height={height}")
+        return PDFSignatureManager.sign_pdf_batch(pdf_file, [{
+            'signature_data': signature_data, 'page': page,
+            'x': x, 'y': y, 'width': width, 'height': height,
+        }])
+
+    @staticmethod
+    def sign_pdf_batch(pdf_file, placements):
+        """
+        Place plusieurs signatures en une seule passe lecture/fusion/écriture,
+        par mise à jour incrémentale
+        
+        Chaque page concernée n'est réécrite qu'une fois et chaque image distincte
+        n'est intégrée qu'une fois. Si le document ne peut pas être mis à jour de
+        manière incrémentale (PDF chiffré, structure xref illisible), il est réécrit
+        entièrement en mémoire.
+        
+        Args:
+            pdf_file (str | file-like): Chemin ou flux binaire du document PDF
+            placements (list[dict]): signature_data, page, x, y, width, height et
+                image_key éventuel (signature sauvegardée, voir signature_cache)
+        
+        Returns:
+            BytesIO: Contenu du PDF signé, positionné au début
+        """
+        pdf_bytes = PDFSignatureManager._read_pdf_bytes(pdf_file)
+        
+        try:
+            updater = IncrementalPDFUpdater(pdf_bytes)
+        except IncrementalUpdateError as e:
+            logger.warning(f"Mise à jour incrémentale impossible ({str(e)}), réécriture complète du PDF")
+            return PDFSignatureManager.rewrite_pdf_batch(BytesIO(pdf_bytes), placements)
+        
+        try:
+            by_page = PDFSignatureManager._group_placements(placements, len(updater.reader.pages))
+            
+            images = {}
+            for page, page_placements in by_page.items():
+                for placement in page_placements:
+                    signature_data = placement['signature_data']
+                    if signature_data not in images:
+                        images[signature_data] = signature_cache.get_signature_image(
+                            placement.get('image_key'), signature_data
+                        )
+                    updater.add_image(
+                        page, images[signature_data], placement['x'], placement['y'],
+                        placement['width'], placement['height'], image_key=signature_data
+                    )
+            
+            signed_pdf = BytesIO()
+            updater.write(signed_pdf)
+            signed_pdf.seek(0)
+            return signed_pdf
+        except Exception as e:
+            logger.error(f"Erreur lors de la signature incrémentale du PDF: {str(e)}")
+            raise
 
 # Pour la compatibilité avec le code existant
 create_signature_image = PDFSignatureManager.create_signature_image
 add_signature_to_pdf = PDFSignatureManager.add_signature_to_pdf
-sign_pdf_with_base64 = PDFSignatureManager.sign_pdf_with_base64
\ No newline at end of file
+sign_pdf_with_base64 = PDFSignatureManager.sign_pdf_with_base64
+sign_pdf_in_memory = PDFSignatureManager.sign_pdf_in_memory
+sign_pdf_incremental = PDFSignatureManager.sign_pdf_incremental
+sign_pdf_batch = PDFSignatureManager.sign_pdf_batch
\ No newline at end of file
@@ -1,21 +1,57 @@
 from rest_framework import serializers
-from .models import Document, Signature, SavedSignature, DocumentSigner
-from users.serializers import UserSerializer
+from .models import Document, Signature, SavedSignature, DocumentSigner, SigningJob
+from users.serializers import UserSummarySerializer
 from certificates.serializers import CertificateSerializer
 from django.contrib.auth import get_user_model
+from django.db.models import BooleanField, ExpressionWrapper, Prefetch, Q
+from django.urls import reverse
+from core.fieldsets import SparseFieldsetSerializerMixin
 import collections
 
 User = get_user_model()
 
-class DocumentSerializer(serializers.ModelSerializer):
-    uploaded_by = UserSerializer(read_only=True)
+
+def document_file_url(serializer, obj):
+    """URL du téléchargement contrôlé (DocumentViewSet.download_document) : /media/ n'est pas public"""
+    url = reverse('document-download-document', kwargs={'pk': obj.pk})
+    request = serializer.context.get('request')
+    return request.build_absolute_uri(url) if request else url
+
+
+class DocumentSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    # Représentation compacte : jamais de mot de passe ni de permissions
+    uploaded_by = UserSummarySerializer(read_only=True)
     signatures = serializers.SerializerMethodField()
     certificate = CertificateSerializer(read_only=True)
 
     class Meta:
         model = Document
-        fields = ['id', 'title', 'file', 'uploaded_by', 'created_at', 'status', 'signatures', 'certificate']
-        read_only_fields = ['hash', 'status', 'certificate']
+        fields = ['id', 'title', 'file', 'uploaded_by', 'created_at', 'status', 'signatures', 'certificate', 'page_geometry']
+        read_only_fields = ['hash', 'status', 'certificate', 'page_geometry']
+        fieldset_hints = {
+            'signatures': {'prefetch': [lambda: Prefetch(
+                'signature_set',
+                queryset=SignatureSerializer.setup_eager_loading(Signature.objects.all()),
+            )]},
+            # Pas de champ certificate sur Document : le champ n'est jamais rendu
+            'certificate': {},
+        }
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if data.get('file'):
+            data['file'] = document_file_url(self, instance)
+        return data
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Charge en un nombre fixe de requêtes tout ce que le sérialiseur affiche"""
+        return queryset.select_related('uploaded_by').prefetch_related(
+            Prefetch(
+                'signature_set',
+                queryset=SignatureSerializer.setup_eager_loading(Signature.objects.all()),
+            ),
+        )
 
     def get_signatures(self, obj):
         if isinstance(obj, collections.OrderedDict):
@@ -27,8 +63,8 @@ class DocumentSerializer(serializers.ModelSerializer):
             return SignatureSerializer(obj.signature_set.all(), many=True).data
         return []
 
-class SignatureSerializer(serializers.ModelSerializer):
-    signer = UserSerializer(read_only=True)
+class SignatureSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    signer = UserSummarySerializer(read_only=True)
     certificate = CertificateSerializer(read_only=True)
     signature_data = serializers.CharField()
 
@@ -37,6 +73,36 @@ class SignatureSerializer(serializers.ModelSerializer):
         fields = ['id', 'document', 'signer', 'certificate', 'signature_data', 'drawn_signature', 'signature_position_x', 'signature_position_y', 'signature_page']
         read_only_fields = ['signature_data']
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('signer', 'certificate')
+
+class SignatureSummarySerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    """Signature sans l'image base64 : l'image est servie par son URL"""
+    image_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Signature
+        fields = ['id', 'signer', 'timestamp', 'signature_page', 'signature_position_x', 'signature_position_y', 'image_url']
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        # drawn_signature n'est jamais chargé, seule sa présence est calculée en base
+        return queryset.only(
+            'id', 'document_id', 'signer_id', 'timestamp',
+            'signature_page', 'signature_position_x', 'signature_position_y',
+        ).annotate(
+            has_image=ExpressionWrapper(Q(drawn_signature__gt=''), output_field=BooleanField())
+        )
+
+    def get_image_url(self, obj):
+        has_image = obj.has_image if hasattr(obj, 'has_image') else bool(obj.drawn_signature)
+        if not has_image:
+            return None
+        url = reverse('document-signature-image', kwargs={'pk': obj.document_id, 'signature_id': obj.id})
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
 class SignatureDessinSerializer(serializers.ModelSerializer):
     signature = serializers.CharField()  # Base64 de l'image de signature
     position = serializers.DictField(
@@ -55,36 +121,115 @@ class SignatureDessinSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError(f"La clé '{key}' est requise dans la position")
         return value 
     
-class SavedSignatureSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
+class DocumentListSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    """Représentation compacte des documents pour la liste (DocumentSerializer reste utilisé pour le détail)"""
+    uploaded_by = UserSummarySerializer(read_only=True)
+    signature_count = serializers.SerializerMethodField()
+    signatures = SignatureSummarySerializer(source='signature_set', many=True, read_only=True)
+
+    class Meta:
+        model = Document
+        fields = ['id', 'title', 'file', 'uploaded_by', 'created_at', 'status', 'signature_count', 'signatures']
+        read_only_fields = fields
+        fieldset_hints = {
+            'signature_count': {'prefetch': [lambda: DocumentListSerializer.signature_prefetch()]},
+            'signatures': {'prefetch': [lambda: DocumentListSerializer.signature_prefetch()]},
+        }
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if data.get('file'):
+            data['file'] = document_file_url(self, instance)
+        return data
+
+    @staticmethod
+    def signature_prefetch():
+        return Prefetch(
+            'signature_set',
+            queryset=SignatureSummarySerializer.setup_eager_loading(Signature.objects.all()),
+        )
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('uploaded_by').prefetch_related(DocumentListSerializer.signature_prefetch())
+
+    def get_signature_count(self, obj):
+        return len(obj.signature_set.all())
+
+def saved_signature_image_url(serializer, obj):
+    """URL de l'aperçu binaire (SavedSignatureViewSet.image), validé par ETag"""
+    url = reverse('saved-signature-image', kwargs={'pk': obj.pk})
+    request = serializer.context.get('request')
+    return request.build_absolute_uri(url) if request else url
+
+class SavedSignatureSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    user = UserSummarySerializer(read_only=True)
     signature_data = serializers.CharField(write_only=True)  # Écriture uniquement pour la sécurité
+    image_url = serializers.SerializerMethodField()
     
     class Meta:
         model = SavedSignature
-        fields = ['id', 'user', 'name', 'signature_data', 'is_default', 'created_at', 'last_used_at']
+        fields = ['id', 'user', 'name', 'signature_data', 'is_default', 'created_at', 'last_used_at', 'image_url']
         read_only_fields = ['id', 'user', 'created_at', 'last_used_at']
+        fieldset_hints = {'image_url': {'columns': ['id']}}
     
     def create(self, validated_data):
         # Associer l'utilisateur actuel à la signature
         user = self.context['request'].user
         validated_data['user'] = user
         return super().create(validated_data)
+    
+    def get_image_url(self, obj):
+        return saved_signature_image_url(self, obj)
 
-class SavedSignatureListSerializer(serializers.ModelSerializer):
+class SavedSignatureListSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Sérialiseur pour la liste des signatures sauvegardées (sans les données sensibles)"""
+    image_url = serializers.SerializerMethodField()
+
     class Meta:
         model = SavedSignature
-        fields = ['id', 'name', 'is_default', 'created_at', 'last_used_at']
+        fields = ['id', 'name', 'is_default', 'created_at', 'last_used_at', 'image_url']
         read_only_fields = ['id', 'created_at', 'last_used_at']
+        fieldset_hints = {'image_url': {'columns': ['id']}}
+
+    def get_image_url(self, obj):
+        return saved_signature_image_url(self, obj)
 
-class DocumentSignerSerializer(serializers.ModelSerializer):
-    user = UserSerializer(read_only=True)
+class SigningJobSerializer(serializers.ModelSerializer):
+    """Statut d'un travail de signature (sans les images de signature)"""
+    document = serializers.SerializerMethodField()
+
+    class Meta:
+        model = SigningJob
+        fields = ['id', 'status', 'error', 'created_at', 'started_at', 'finished_at', 'document']
+        read_only_fields = fields
+
+    def get_document(self, obj):
+        # Le document n'est renvoyé qu'une fois signé
+        if obj.status != 'done':
+            return {'id': str(obj.document_id)}
+        return DocumentSerializer(obj.document, context=self.context).data
+
+class DocumentSignerSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    user = UserSummarySerializer(read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
     document = DocumentSerializer(read_only=True)  # Inclut tous les champs du document
 
     class Meta:
         model = DocumentSigner
         fields = '__all__'
+        fieldset_hints = {'status_display': {'columns': ['status']}}
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        # Le document imbriqué est rendu en entier par DocumentSerializer
+        return queryset.select_related('user', 'document__uploaded_by').prefetch_related(
+            Prefetch(
+                'document__signature_set',
+                queryset=SignatureSerializer.setup_eager_loading(Signature.objects.all()),
+            ),
+        )
+
 class DocumentSignerCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = DocumentSigner
@@ -102,4 +247,8 @@ class DocumentWithSignersSerializer(DocumentSerializer):
     signers = DocumentSignerSerializer(many=True, read_only=True)
     
     class Meta(DocumentSerializer.Meta):
-        fields = DocumentSerializer.Meta.fields + ['signers']
\ No newline at end of file
+        fields = DocumentSerializer.Meta.fields + ['signers']
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return DocumentSerializer.setup_eager_loading(queryset).prefetch_related('signers')
\ No newline at end of file
@@ -0,0 +1,44 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from certificates.models import Certificate
+from .models import Document, SavedSignature, Signature
+from . import signature_cache
+from .storage import remove_reference
+from .stats_cache import invalidate_user_stats
+
+
+@receiver([post_save, post_delete], sender=Document)
+def invalidate_document_owner_stats(sender, instance, **kwargs):
+    invalidate_user_stats(instance.uploaded_by_id)
+
+
+@receiver([post_save, post_delete], sender=Signature)
+def invalidate_signer_stats(sender, instance, **kwargs):
+    invalidate_user_stats(instance.signer_id)
+
+
+@receiver([post_save, post_delete], sender=Certificate)
+def invalidate_certificate_owner_stats(sender, instance, **kwargs):
+    invalidate_user_stats(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=SavedSignature)
+def invalidate_saved_signature_cache(sender, instance, update_fields=None, **kwargs):
+    # Une sauvegarde limitée à d'autres champs que les données laisse le cache valable
+    if update_fields and 'signature_data' not in update_fields:
+        return
+    signature_cache.invalidate(instance.pk)
+
+
+@receiver(pre_delete, sender=Document)
+def remember_document_file(sender, instance, **kwargs):
+    # Lecture tant que la ligne existe encore (champ file éventuellement différé)
+    instance._deleted_file_name = instance.file.name
+
+
+@receiver(post_delete, sender=Document)
+def release_document_blob(sender, instance, **kwargs):
+    # Aussi appelé pour les suppressions en masse et en cascade (utilisateur supprimé)
+    file_name = getattr(instance, '_deleted_file_name', None)
+    remove_reference(file_name if file_name is not None else instance.file.name)
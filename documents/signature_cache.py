@@ -0,0 +1,155 @@
+"""
+Cache en mémoire des signatures sauvegardées, par processus.
+
+Une signature sauvegardée est réutilisée sur de nombreux documents : au lieu de
+refaire à chaque signature le déchiffrement Fernet, le décodage base64 et le
+décodage PNG, on garde :
+- dans le processus web, les données déchiffrées (SavedSignature.decrypt_signature) ;
+- dans les processus du pool PDF, l'image décodée, prête à être dessinée
+  (PDFSignatureManager.sign_pdf_batch et rewrite_pdf_batch).
+
+Les entrées sont indexées par SavedSignature.image_key, « identifiant:version »,
+où la version est une empreinte des données chiffrées stockées : une signature
+modifiée (ou rechiffrée) change de clé, y compris dans les processus du pool qui
+ne reçoivent pas les signaux. Les signaux de documents/signals.py suppriment en
+plus les entrées locales dès qu'une signature est modifiée ou supprimée.
+
+La mémoire est bornée en octets (SIGNATURE_CACHE_MAX_BYTES par cache et par
+processus, 0 pour désactiver) ; les entrées les moins récemment utilisées sont
+évincées en premier.
+"""
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+from django.conf import settings
+from PIL import Image
+import logging
+
+# Configurer le logger
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+
+class SignatureCache:
+    """LRU borné par la taille estimée des valeurs, sûr entre threads"""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def max_bytes(self):
+        return getattr(settings, 'SIGNATURE_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)
+
+    def get_or_create(self, key, create, sizeof):
+        """
+        Retourne la valeur en cache ou la crée avec `create()` et la met en cache
+
+        Args:
+            key (str): Clé de l'entrée (None : pas de cache)
+            create (callable): Fonction sans argument qui calcule la valeur
+            sizeof (callable): Taille estimée de la valeur, en octets
+        """
+        if key is not None:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                self.misses += 1
+
+        # Calcul hors du verrou : deux threads peuvent décoder la même signature,
+        # le second remplace simplement l'entrée du premier
+        value = create()
+        if key is not None:
+            self._put(key, value, sizeof(value))
+        return value
+
+    def _put(self, key, value, size):
+        max_bytes = self.max_bytes
+        if size > max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous[1]
+            self._entries[key] = (value, size)
+            self.size += size
+            while self.size > max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+
+    def invalidate(self, signature_id):
+        """Supprime toutes les versions d'une signature"""
+        prefix = f"{signature_id}:"
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                self.size -= self._entries.pop(key)[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+_data_cache = SignatureCache()
+_image_cache = SignatureCache()
+
+
+def get_signature_data(image_key, decrypt):
+    """Données de signature déchiffrées (base64), calculées par `decrypt()` si absentes"""
+    return _data_cache.get_or_create(image_key, decrypt, len)
+
+
+def _decode_image(signature_data):
+    # Import local : pdf_signer importe ce module
+    from .pdf_signer import PDFSignatureManager
+    image = Image.open(BytesIO(PDFSignatureManager.decode_signature_data(signature_data)))
+    # Conversion immédiate : l'image partagée est entièrement chargée et n'est plus modifiée
+    return image.convert('RGBA')
+
+
+def get_signature_image(image_key, signature_data):
+    """
+    Image de signature décodée (PIL, RGBA)
+
+    Args:
+        image_key (str | None): SavedSignature.image_key, None pour une signature dessinée
+        signature_data (str): Données base64, décodées seulement si l'image est absente du cache
+    """
+    return _image_cache.get_or_create(
+        image_key,
+        lambda: _decode_image(signature_data),
+        lambda image: image.width * image.height * len(image.getbands()),
+    )
+
+
+def invalidate(signature_id):
+    """Supprime les données et l'image d'une signature sauvegardée du cache du processus"""
+    _data_cache.invalidate(signature_id)
+    _image_cache.invalidate(signature_id)
+
+
+def clear():
+    _data_cache.clear()
+    _image_cache.clear()
+
+
+def cache_stats():
+    return {'data': _data_cache.stats(), 'image': _image_cache.stats()}
@@ -0,0 +1,92 @@
+"""
+Enregistrement différé de la dernière utilisation des signatures sauvegardées.
+
+Chaque aperçu ou signature mettait à jour last_used_at par un UPDATE synchrone.
+Les utilisations sont maintenant notées en mémoire puis écrites par lots, en un
+seul UPDATE, au plus tard SIGNATURE_USAGE_FLUSH_INTERVAL secondes après la
+première utilisation en attente (0 : écriture immédiate) et à l'arrêt du processus.
+L'écriture à l'échéance est faite par un minuteur (thread démon) armé à la première
+utilisation en attente, même si aucune autre requête n'arrive.
+La date n'est utilisée que pour trier les signatures : une perte en cas d'arrêt
+brutal est acceptable.
+"""
+import atexit
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+import logging
+
+# Configurer le logger
+logger = logging.getLogger(__name__)
+
+# Au-delà, les utilisations en attente sont écrites sans attendre l'intervalle
+MAX_PENDING = 500
+
+_lock = threading.Lock()
+_pending = {}
+_first_pending_at = None
+_timer = None
+
+
+def _flush_on_timer():
+    try:
+        flush()
+    finally:
+        # Connexion propre au thread du minuteur
+        connection.close()
+
+
+def record_use(signature_id, used_at=None):
+    """Note l'utilisation d'une signature sauvegardée ; l'écriture est différée"""
+    global _first_pending_at, _timer
+    interval = getattr(settings, 'SIGNATURE_USAGE_FLUSH_INTERVAL', 60)
+    with _lock:
+        _pending[signature_id] = used_at or timezone.now()
+        if _first_pending_at is None:
+            _first_pending_at = time.monotonic()
+        due = (
+            len(_pending) >= MAX_PENDING
+            or time.monotonic() - _first_pending_at >= interval
+        )
+        if not due and _timer is None:
+            _timer = threading.Timer(interval, _flush_on_timer)
+            _timer.daemon = True
+            _timer.start()
+    if due:
+        flush()
+
+
+def flush():
+    """
+    Écrit les utilisations en attente en un seul UPDATE
+
+    Returns:
+        int: Nombre de signatures mises à jour
+    """
+    global _pending, _first_pending_at, _timer
+    with _lock:
+        pending, _pending, _first_pending_at = _pending, {}, None
+        if _timer is not None and _timer is not threading.current_thread():
+            _timer.cancel()
+        _timer = None
+    if not pending:
+        return 0
+
+    from .models import SavedSignature
+    try:
+        return SavedSignature.objects.filter(id__in=list(pending)).update(
+            last_used_at=Case(
+                *[When(id=signature_id, then=Value(used_at)) for signature_id, used_at in pending.items()],
+                output_field=DateTimeField(),
+            )
+        )
+    except Exception as e:
+        logger.warning(f"Impossible d'enregistrer l'utilisation de {len(pending)} signature(s): {str(e)}")
+        return 0
+
+
+atexit.register(flush)
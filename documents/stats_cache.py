@@ -0,0 +1,57 @@
+"""
+Cache des statistiques du tableau de bord, par utilisateur.
+
+Les entrées sont supprimées par les signaux de documents/signals.py dès qu'un
+document, une signature ou un certificat de l'utilisateur change ;
+STATS_CACHE_TIMEOUT borne leur durée de vie si un changement échappe aux signaux
+(update() ou bulk_create() sur un queryset, par exemple).
+"""
+from django.conf import settings
+from django.core.cache import cache
+import logging
+
+# Configurer le logger
+logger = logging.getLogger(__name__)
+
+
+def user_stats_key(user_id):
+    return f"documents:stats:{user_id}"
+
+
+def get_user_stats(user, compute):
+    """
+    Retourne les statistiques en cache de l'utilisateur, ou les calcule et les met en cache
+
+    Args:
+        user (User): Utilisateur authentifié
+        compute (callable): Fonction sans argument qui calcule les statistiques
+
+    Returns:
+        dict: Statistiques de l'utilisateur
+    """
+    key = user_stats_key(user.pk)
+    try:
+        stats = cache.get(key)
+    except Exception as e:
+        # Un cache indisponible ne doit pas empêcher l'affichage du tableau de bord
+        logger.warning(f"Cache des statistiques indisponible: {str(e)}")
+        return compute()
+
+    if stats is None:
+        stats = compute()
+        try:
+            cache.set(key, stats, getattr(settings, 'STATS_CACHE_TIMEOUT', 300))
+        except Exception as e:
+            logger.warning(f"Impossible de mettre en cache les statistiques: {str(e)}")
+    return stats
+
+
+def invalidate_user_stats(*user_ids):
+    """Supprime les statistiques en cache des utilisateurs donnés"""
+    keys = [user_stats_key(user_id) for user_id in set(user_ids) if user_id]
+    if not keys:
+        return
+    try:
+        cache.delete_many(keys)
+    except Exception as e:
+        logger.warning(f"Impossible d'invalider les statistiques en cache: {str(e)}")
@@ -0,0 +1,109 @@
+"""
+Stockage adressé par contenu des fichiers de documents.
+
+Chaque fichier est enregistré sous blobs/<aa>/<bb>/<sha256><extension> : deux contenus
+identiques (même document déposé deux fois, version signée identique) partagent un
+seul fichier, et le chemin d'un contenu se déduit de son hash sans requête en base.
+
+Les références sont comptées dans StoredBlob (mises à jour par Document.save et
+Document.delete) ; un blob qui n'est plus référencé n'est supprimé que par la
+commande collect_blobs, après un délai de grâce.
+"""
+import hashlib
+import os
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db.models import F
+from django.utils import timezone
+import logging
+
+# Configurer le logger
+logger = logging.getLogger(__name__)
+
+BLOB_PREFIX = 'blobs'
+
+
+def blob_name(digest, extension=''):
+    """Chemin relatif d'un contenu à partir de son SHA-256 (répertoires à deux niveaux)"""
+    return f"{BLOB_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}{extension.lower()}"
+
+
+def is_blob_name(name):
+    return bool(name) and name.startswith(f"{BLOB_PREFIX}/")
+
+
+def _blob_model():
+    # Import tardif : documents.models importe ce module pour déclarer Document.file
+    return apps.get_model('documents', 'StoredBlob')
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage qui nomme les fichiers par le SHA-256 de leur contenu"""
+
+    def _save(self, name, content):
+        digest = getattr(content, 'sha256', None) or getattr(getattr(content, 'file', None), 'sha256', None)
+        if not digest:
+            sha256 = hashlib.sha256()
+            for chunk in content.chunks():
+                sha256.update(chunk)
+            digest = sha256.hexdigest()
+        target = blob_name(digest, os.path.splitext(name)[1])
+
+        if not self.exists(target):
+            stored = super()._save(target, content)
+            if stored != target:
+                # Écrit en parallèle par une autre requête : le contenu est le même
+                super().delete(stored)
+        else:
+            logger.debug(f"Blob {digest} déjà présent, écriture ignorée")
+
+        _blob_model().objects.get_or_create(
+            digest=digest,
+            defaults={'name': target, 'size': content.size, 'unreferenced_at': timezone.now()},
+        )
+        return target
+
+    def delete(self, name):
+        """Ne supprime un blob que s'il n'est plus référencé"""
+        if not is_blob_name(name):
+            return super().delete(name)
+        StoredBlob = _blob_model()
+        if StoredBlob.objects.filter(name=name, ref_count__gt=0).exists():
+            logger.debug(f"Blob {name} encore référencé, suppression ignorée")
+            return
+        super().delete(name)
+        StoredBlob.objects.filter(name=name).delete()
+
+    def name_for_digest(self, digest, extension='.pdf'):
+        """Nom du blob d'un contenu, ou None s'il n'est pas stocké (sans requête en base)"""
+        name = blob_name(digest, extension)
+        return name if self.exists(name) else None
+
+
+def add_reference(name):
+    """Un document pointe désormais vers ce blob"""
+    if is_blob_name(name):
+        _blob_model().objects.filter(name=name).update(ref_count=F('ref_count') + 1, unreferenced_at=None)
+
+
+def remove_reference(name):
+    """Un document ne pointe plus vers ce blob"""
+    if is_blob_name(name):
+        StoredBlob = _blob_model()
+        StoredBlob.objects.filter(name=name).update(ref_count=F('ref_count') - 1)
+        StoredBlob.objects.filter(name=name, ref_count__lte=0, unreferenced_at__isnull=True).update(
+            unreferenced_at=timezone.now()
+        )
+
+
+def get_document_storage():
+    """Stockage de Document.file (DOCUMENT_STORAGE_CONTENT_ADDRESSED=False pour l'ancien nommage)"""
+    if getattr(settings, 'DOCUMENT_STORAGE_CONTENT_ADDRESSED', True):
+        return content_addressed_storage
+    from django.core.files.storage import default_storage
+    return default_storage
+
+
+content_addressed_storage = ContentAddressedStorage()
@@ -0,0 +1,64 @@
+import uuid
+
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from certificates.models import Certificate
+from documents.models import Document, DocumentSigner, Signature
+from users.models import User
+
+
+class DocumentQueryCountTests(APITestCase):
+    """
+    Nombre de requêtes fixe pour la liste et le détail des documents, quelle que
+    soit la taille de la page ou le nombre de signatures et de signataires
+    """
+    # Utilisateur déjà authentifié (force_authenticate) : aucune requête d'authentification
+    LIST_QUERIES = 2
+    RETRIEVE_QUERIES = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='query-count@example.com', username='query-count', password=None)
+        cls.certificate = Certificate.objects.create(
+            user=cls.user, public_key='-', private_key='-',
+            valid_until=timezone.now() + timezone.timedelta(days=1),
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user)
+
+    def create_documents(self, count, signatures_per_document=3):
+        # bulk_create : aucun fichier n'est écrit sur le stockage
+        documents = Document.objects.bulk_create([
+            Document(title=f'Document {i}', file='documents/query-count.pdf', uploaded_by=self.user, hash=uuid.uuid4().hex)
+            for i in range(count)
+        ])
+        Signature.objects.bulk_create([
+            Signature(document=document, signer=self.user, certificate=self.certificate, signature_data='-')
+            for document in documents
+            for _ in range(signatures_per_document)
+        ])
+        return documents
+
+    def test_list_query_count_does_not_depend_on_page_size(self):
+        self.create_documents(50)
+        for page_size in (1, 10, 50):
+            with self.subTest(page_size=page_size):
+                with self.assertNumQueries(self.LIST_QUERIES):
+                    response = self.client.get('/api/documents/', {'page_size': page_size})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['results']), page_size)
+
+    def test_retrieve_query_count_does_not_depend_on_related_rows(self):
+        for related in (1, 10, 50):
+            with self.subTest(related=related):
+                document = self.create_documents(1, signatures_per_document=related)[0]
+                DocumentSigner.objects.bulk_create([
+                    DocumentSigner(document=document, email=f'signer-{i}@example.com', full_name=f'Signataire {i}')
+                    for i in range(related)
+                ])
+                with self.assertNumQueries(self.RETRIEVE_QUERIES):
+                    response = self.client.get(f'/api/documents/{document.pk}/')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['signatures']), related)
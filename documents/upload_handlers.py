@@ -0,0 +1,49 @@
+"""
+Gestionnaires d'upload qui calculent le SHA-256 du fichier pendant sa réception.
+
+Le hash est disponible sur le fichier reçu (attribut sha256) avant tout accès au
+stockage : les doublons peuvent être refusés sans écrire le fichier ni relire son
+contenu. Configurés dans FILE_UPLOAD_HANDLERS.
+"""
+import hashlib
+
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+
+from .utils import calculate_document_hash
+
+
+class HashingUploadHandlerMixin:
+    """Met à jour le hash avec chaque bloc conservé par ce gestionnaire"""
+
+    def new_file(self, *args, **kwargs):
+        self.sha256 = hashlib.sha256()
+        return super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        remaining = super().receive_data_chunk(raw_data, start)
+        # Un gestionnaire qui ne retourne rien a conservé le bloc : lui seul le hache
+        if remaining is None:
+            self.sha256.update(raw_data)
+        return remaining
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.sha256 = self.sha256.hexdigest()
+        return file
+
+
+class HashingMemoryFileUploadHandler(HashingUploadHandlerMixin, MemoryFileUploadHandler):
+    """Fichiers reçus en mémoire (sous FILE_UPLOAD_MAX_MEMORY_SIZE)"""
+
+
+class HashingTemporaryFileUploadHandler(HashingUploadHandlerMixin, TemporaryFileUploadHandler):
+    """Fichiers reçus dans un fichier temporaire"""
+
+
+def get_upload_hash(file):
+    """
+    SHA-256 d'un fichier reçu, calculé par les gestionnaires ci-dessus ou, à défaut
+    (fichier non issu d'un upload multipart), par une lecture par blocs
+    """
+    return getattr(file, 'sha256', None) or calculate_document_hash(file)
@@ -6,6 +6,7 @@ router = DefaultRouter()
 router.register(r'documents', DocumentViewSet, basename='document')
 # router.register(r'signatures', SignatureViewSet, basename='signature')  # Cette vue n'est pas définie
 router.register(r'saved-signatures', SavedSignatureViewSet, basename='saved-signature')
+router.register(r'signing-jobs', SigningJobViewSet, basename='signing-job')
 
 # Routes imbriquées pour les signataires d'un document spécifique
 document_signers_router = DefaultRouter()
@@ -23,5 +24,6 @@ urlpatterns = [
             'delete': 'destroy'
         })),
         path('sign_pdf_with_token/', DocumentSignerViewSet.as_view({'post': 'sign_pdf_with_token'})),
+        path('download_with_token/', DocumentSignerViewSet.as_view({'get': 'download_with_token'})),
     ])),
 ]
\ No newline at end of file
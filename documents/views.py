@@ -1,29 +1,172 @@
-from itertools import count
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.core.exceptions import PermissionDenied
-from .models import Document, Signature, SavedSignature, DocumentSigner
+from rest_framework.pagination import CursorPagination
+from rest_framework.filters import SearchFilter
+from django_filters.rest_framework import DjangoFilterBackend
+from django.core.exceptions import ValidationError as DjangoValidationError
+from .models import Document, Signature, SavedSignature, DocumentSigner, SigningJob
 
-from .serializers import DocumentSerializer, SignatureSerializer, SignatureDessinSerializer, SavedSignatureSerializer, SavedSignatureListSerializer, DocumentSignerSerializer, DocumentSignerCreateSerializer, DocumentWithSignersSerializer
-from .utils import calculate_document_hash, verify_signature,send_notification_email, sign_document
+from .serializers import DocumentSerializer, SignatureSerializer, SignatureDessinSerializer, SavedSignatureSerializer, SavedSignatureListSerializer, SigningJobSerializer, DocumentListSerializer, DocumentSignerSerializer, DocumentSignerCreateSerializer, DocumentWithSignersSerializer
+from .filters import DocumentFilter, DocumentSignerFilter
+from .utils import calculate_document_hash, verify_signature,send_notification_email
 from certificates.models import Certificate
-from django.db import transaction
+from subscriptions.models import DailyUsage
+from subscriptions.services.quota_service import QuotaService, QuotaExceeded
+from subscriptions.services.active_subscription import ActiveSubscriptionResolver
+from django.db import transaction, IntegrityError
+from django.db.models import Count, Q, Sum
 from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 from django.shortcuts import get_object_or_404
-from django.conf import settings
-import os
-from .pdf_signer import sign_pdf_with_base64, PDFSignatureManager
+from core.stats import monthly_series
+from core.fieldsets import SparseFieldsetViewMixin
+from .pdf_signer import PDFSignatureManager
+from . import pdf_pool
+from .downloads import serve_document
+from .storage import is_blob_name
+from .upload_handlers import get_upload_hash
+from .stats_cache import get_user_stats
+from .pdf_pool import PDFWorkerUnavailable, PDFWorkerBusy
 from django.utils import timezone
-from datetime import datetime, timedelta
-from django.core.mail import send_mail
 
 import logging
 
 logger = logging.getLogger(__name__)
 
-class SavedSignatureViewSet(viewsets.ModelViewSet):
+
+def document_stats(documents, signatures, certificates):
+    """
+    Statistiques du tableau de bord pour les querysets donnés (4 requêtes au total)
+    
+    Returns:
+        dict: totaux et série mensuelle des documents sur 13 mois
+    """
+    document_totals = documents.aggregate(
+        total=Count('id'),
+        pending=Count('id', filter=Q(status='pending')),
+    )
+    return {
+        'total_documents': document_totals['total'],
+        'total_signatures': signatures.count(),
+        'total_certificates': certificates.count(),
+        'total_pending': document_totals['pending'],
+        'monthly_stats': monthly_series(documents),
+    }
+
+
+def rollup_document_stats():
+    """Statistiques globales lues dans l'agrégat journalier (voir refresh_usage_rollup)"""
+    totals = DailyUsage.objects.aggregate(
+        total_documents=Sum('documents_uploaded'),
+        total_signatures=Sum('signatures'),
+        total_certificates=Sum('certificates'),
+        total_pending=Sum('documents_pending'),
+    )
+    stats = {key: value or 0 for key, value in totals.items()}
+    stats['monthly_stats'] = monthly_series(DailyUsage.objects.all(), date_field='day', aggregate=Sum('documents_uploaded'))
+    return stats
+
+
+def pdf_worker_error_response(error):
+    """Réponse renvoyée quand le pool PDF est saturé ou trop lent"""
+    if isinstance(error, PDFWorkerBusy):
+        return Response(
+            {"error": "Le service de signature est saturé, veuillez réessayer dans quelques instants"},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={'Retry-After': '5'}
+        )
+    logger.error(f"Traitement PDF indisponible: {str(error)}")
+    return Response(
+        {"error": str(error)},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+
+def quota_error_response(subscription, count=1):
+    """Réponse d'erreur si l'abonnement ne permet pas `count` signatures, sinon None"""
+    if not subscription:
+        return Response(
+            {"error": "Vous n'avez pas d'abonnement actif"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if subscription.is_expired:
+        return Response(
+            {"error": "Votre abonnement a expiré."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if not QuotaService.has_remaining(subscription, count):
+        return Response(
+            {"error": "Vous avez atteint votre limite de signatures pour ce mois"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return None
+
+def quota_exceeded_response(error):
+    """Le quota a été consommé par une autre requête entre la vérification et la réservation"""
+    return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+def wants_async(request):
+    """Paramètre `async` des vues de signature"""
+    return str(request.data.get('async', '')).lower() in ('1', 'true', 'yes')
+
+def enqueue_signing_job(request, document, certificate, subscription, placements):
+    """
+    Enregistre un travail de signature exécuté par run_signing_worker (réponse 202)
+
+    Le quota est réservé dès l'enregistrement du travail et rendu s'il échoue.
+    """
+    try:
+        with transaction.atomic():
+            if not QuotaService.reserve(subscription, len(placements)):
+                raise QuotaExceeded("Vous avez atteint votre limite de signatures pour ce mois")
+            job = SigningJob.objects.create(
+                document=document,
+                requested_by=request.user,
+                certificate=certificate,
+                subscription=subscription,
+                placements=SigningJob.stored_placements(placements),
+            )
+    except QuotaExceeded as e:
+        return quota_exceeded_response(e)
+    
+    logger.info(f"Travail de signature {job.id} enregistré pour le document {document.id}")
+    return Response(
+        {"message": "Signature en cours de traitement", "job": SigningJobSerializer(job).data},
+        status=status.HTTP_202_ACCEPTED
+    )
+
+def signature_image_response(request, version, load_data, cache_control):
+    """
+    Réponse binaire d'une image de signature, validée par ETag (304 si inchangée)
+
+    Args:
+        version (str): Identifie le contenu de l'image (sert d'ETag)
+        load_data (callable): Retourne les données base64 ; appelée seulement sans 304
+        cache_control (str): En-tête Cache-Control
+    """
+    etag = quote_etag(version)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        data = load_data()
+        content_type = 'image/png'
+        if data.startswith('data:image/'):
+            content_type = data[len('data:'):].split(';', 1)[0]
+        try:
+            image = PDFSignatureManager.decode_signature_data(data)
+        except (ValueError, TypeError) as e:
+            logger.error(f"Image de signature {version} invalide: {str(e)}")
+            return Response(
+                {"error": "Image de signature invalide"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        response = HttpResponse(image, content_type=content_type)
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    return response
+
+class SavedSignatureViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """
     ViewSet pour gérer les signatures sauvegardées des utilisateurs.
     """
@@ -67,34 +210,98 @@ class SavedSignatureViewSet(viewsets.ModelViewSet):
                 {'error': 'Impossible de récupérer les données de signature'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+    
+    @action(detail=True, methods=['get'])
+    def image(self, request, pk=None):
+        """
+        Image de la signature (aperçu), au lieu du base64 de get_data
 
-class DocumentViewSet(viewsets.ModelViewSet):
+        La réponse est privée et revalidée à chaque affichage : tant que la
+        signature n'a pas changé, le navigateur reçoit un 304 sans déchiffrement.
+        """
+        signature = self.get_object()
+        try:
+            response = signature_image_response(
+                request, signature.image_key, signature.decrypt_signature,
+                cache_control='private, no-cache'
+            )
+        except DjangoValidationError as e:
+            logger.error(f"Erreur lors du déchiffrement de la signature: {str(e)}")
+            return Response(
+                {'error': 'Impossible de récupérer les données de signature'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        signature.mark_as_used()
+        return response
+
+class DocumentCursorPagination(CursorPagination):
+    """
+    Pagination par curseur : le coût d'une page ne dépend pas de sa profondeur
+    (pas d'OFFSET), et l'ordre (created_at, id) reste stable pendant le défilement
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+
+
+class DocumentSignerCursorPagination(DocumentCursorPagination):
+    ordering = ('-invitation_sent_at', '-id')
+
+
+class DocumentViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     serializer_class = DocumentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = DocumentCursorPagination
+    filter_backends = [DjangoFilterBackend, SearchFilter]
+    filterset_class = DocumentFilter
+    search_fields = ['title']
 
     def get_queryset(self):
-        return Document.objects.filter(uploaded_by=self.request.user)
-
-    def perform_create(self, serializer):
-        try:
-            with transaction.atomic():  # Début de la transaction
-                document = serializer.save(uploaded_by=self.request.user)
-                document.hash = calculate_document_hash(document.file)
-
-                # Vérifier si un document avec ce hash existe déjà
-                existing_document = Document.objects.filter(hash=document.hash).first()
-                if existing_document:
-                    logger.error(f"Un document avec le hash {document.hash} existe déjà.")
-                    return Response({'error': 'Un document avec ce hash existe déjà'}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = Document.objects.filter(uploaded_by=self.request.user)
+        # Précharger ce que les sérialiseurs affichent (nombre de requêtes fixe)
+        if self.action == 'list':
+            queryset = self.get_serializer_class().setup_eager_loading(queryset)
+        elif self.action == 'retrieve':
+            queryset = DocumentWithSignersSerializer.setup_eager_loading(queryset)
+        return queryset
 
-                # Si pas de document existant, enregistrez le nouveau document
-                document.save()
-                logger.info(f"Document créé : {document.id} par l'utilisateur : {self.request.user.email}")
-            return Response(DocumentSerializer(document).data, status=status.HTTP_201_CREATED)
+    def get_serializer_class(self):
+        # Liste compacte (sans images base64 ni utilisateurs complets), sauf avec ?full=true
+        if self.action == 'list' and self.request.query_params.get('full', '').lower() not in ('1', 'true'):
+            return DocumentListSerializer
+        if self.action == 'retrieve':
+            return DocumentWithSignersSerializer
+        return DocumentSerializer
 
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        # Hash calculé pendant la réception du fichier : un doublon est refusé
+        # avant toute écriture sur le stockage ou en base
+        document_hash = get_upload_hash(serializer.validated_data['file'])
+        if Document.objects.filter(hash=document_hash).exists():
+            logger.warning(f"Un document avec le hash {document_hash} existe déjà.")
+            return Response({'error': 'Un document avec ce hash existe déjà'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        document = Document(uploaded_by=request.user, hash=document_hash, **serializer.validated_data)
+        try:
+            document.save()
+        except IntegrityError:
+            # Même fichier envoyé en parallèle. Un blob adressé par contenu est partagé avec le
+            # document gagnant, peut-être pas encore référencé : collect_blobs le libérera
+            # après son délai de grâce s'il reste orphelin
+            if not is_blob_name(document.file.name):
+                document.file.delete(save=False)
+            logger.warning(f"Un document avec le hash {document_hash} existe déjà.")
+            return Response({'error': 'Un document avec ce hash existe déjà'}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             logger.error(f"Erreur lors de la création du document : {str(e)}")
             return Response({'error': 'Une erreur est survenue'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        
+        logger.info(f"Document créé : {document.id} par l'utilisateur : {request.user.email}")
+        return Response(self.get_serializer(document).data, status=status.HTTP_201_CREATED)
 
     @action(detail=True, methods=['post'])
     def sign(self, request, pk=None):
@@ -115,7 +322,7 @@ class DocumentViewSet(viewsets.ModelViewSet):
         
         try:
             # Vérifier que le certificat existe et appartient à l'utilisateur
-            certificate = get_object_or_404(Certificate, id=certificate_id, user=request.user)
+            get_object_or_404(Certificate, id=certificate_id, user=request.user)
             
             # Mettre à jour le statut du document
             document.status = 'signed'
@@ -150,6 +357,8 @@ class DocumentViewSet(viewsets.ModelViewSet):
                 document = self.get_object()
                 serializer = SignatureDessinSerializer(data=request.data)
                 serializer.is_valid(raise_exception=True)
+                # Certificat actif de l'utilisateur associé à la signature
+                certificate = Certificate.objects.filter(user=request.user, status='active').first()
                 
                 signature = Signature.objects.create(
                     document=document,
@@ -168,13 +377,32 @@ class DocumentViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['get'])
     def download_document(self, request, pk=None):
+        """
+        Télécharge le fichier du document en streaming
+        
+        Gère les requêtes Range (206) et conditionnelles (ETag / Last-Modified, 304)
+        """
+        document = self.get_object()
+        return serve_document(request, document)
+
+    @action(detail=True, methods=['get'], url_path=r'signatures/(?P<signature_id>\d+)/image', url_name='signature-image')
+    def signature_image(self, request, pk=None, signature_id=None):
+        """
+        Image d'une signature dessinée du document (remplace le base64 dans la liste)
+        """
         document = self.get_object()
-        file_path = document.file.path
+        signature = Signature.objects.filter(id=signature_id, document=document).only('id', 'drawn_signature').first()
+        if not signature or not signature.drawn_signature:
+            return Response(
+                {"error": "Signature non trouvée"},
+                status=status.HTTP_404_NOT_FOUND
+            )
         
-        with open(file_path, 'rb') as f:
-            response = HttpResponse(f.read(), content_type='application/pdf')
-            response['Content-Disposition'] = f'attachment; filename="{document.title}.pdf"'
-            return response
+        # L'image d'une signature ne change jamais
+        return signature_image_response(
+            request, f"signature-{signature.id}", lambda: signature.drawn_signature,
+            cache_control='private, max-age=86400'
+        )
 
     @action(detail=True, methods=['post'])
     def sign_pdf(self, request, pk=None):
@@ -189,69 +417,16 @@ class DocumentViewSet(viewsets.ModelViewSet):
         - width: largeur de la signature
         - height: hauteur de la signature
         - certificate: ID du certificat à associer au document
+        - async (optionnel): si vrai, le document est signé en arrière-plan et la
+          réponse 202 contient l'identifiant du travail à suivre via /api/signing-jobs/<id>/
         """
         document = self.get_object()
         
-        subscription = request.user.subscriptions.filter(status='active').order_by('-created_at').first()
-        if not subscription :
-            return Response(
-                    {"error": "Vous n'avez pas d'abonnement actif"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        if subscription.signatures_used >= subscription.custom_max_signatures:
-            return Response(
-                    {"error": "Vous avez atteint votre limite de signatures pour ce mois"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        # Vérifier le quota de signatures
-        subscription_qs = request.user.subscriptions.filter(status='active').order_by('-created_at')
-
-        if subscription_qs.exists():
-            subscription = subscription_qs.first()
-
-            # Vérifier si le plan est de type "découverte"
-            if subscription.plan.plan_type != 'decouverte':
-                today = timezone.now()
-                subscription_end = subscription.current_period_end
-
-                # Vérifie si l'abonnement a expiré
-                if subscription_end <= today:
-                    return Response(
-                        {"error": "Votre abonnement a expiré."},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-
-                # Vérifie si la limite de signatures est atteinte
-                if subscription.signatures_used >= subscription.custom_max_signatures:
-                    return Response(
-                        {"error": "Vous avez atteint votre limite de signatures pour ce mois."},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-
-                # Mettre à jour le quota de signatures
-                subscription.signatures_used += 1
-                subscription.save()
-
-            else:
-                subscription = request.user.subscriptions.first()
-                today = timezone.now()  # Cela retourne déjà un datetime avec timezone UTC
-                subscription_end = subscription.current_period_end # Retirer le fuseau horaire  
-
-                if subscription_end <= today :
-                    return Response(
-                            {"error": "Vous avez atteint votre date d'abonnement est expire"},
-                            status=status.HTTP_400_BAD_REQUEST
-                        
-                        )
-                if  subscription.signatures_used >= subscription.custom_max_signatures:
-                    return Response(
-                        {"error": "Vous avez atteint votre limite de signatures pour ce mois"},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                    # mettre à jour le quota de signatures
-                    # signatures_used
-                subscription.signatures_used += 1
-                subscription.save()  
+        # Vérification anticipée (sans requête) ; le quota est réservé juste avant la signature
+        subscription = ActiveSubscriptionResolver.for_request(request)
+        error_response = quota_error_response(subscription)
+        if error_response:
+            return error_response
 
         # Vérifier que le document est un PDF
         if not document.file.name.lower().endswith('.pdf'):
@@ -310,6 +485,13 @@ class DocumentViewSet(viewsets.ModelViewSet):
                     {"error": "Coordonnées de signature invalides (valeurs négatives ou nulles)"},
                     status=status.HTTP_400_BAD_REQUEST
                 )
+            
+            # Vérifier la page à partir de l'index de géométrie, sans relire le PDF
+            if not document.has_page(page):
+                return Response(
+                    {"error": "Numéro de page invalide"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
         except (ValueError, TypeError) as e:
             logger.warning(f"Erreur de conversion des coordonnées: {str(e)}")
             return Response(
@@ -317,47 +499,177 @@ class DocumentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        if wants_async(request):
+            return enqueue_signing_job(request, document, certificate, subscription, [{
+                'signature_data': signature_data, 'page': page,
+                'x': x, 'y': y, 'width': width, 'height': height,
+                'saved_signature_id': None,
+            }])
+        
         try:
-            # Chemin du fichier PDF
-            pdf_path = document.file.path
-            
-            # Signer le PDF
-            signed_pdf_path = PDFSignatureManager.sign_pdf_with_base64(
-                pdf_path, signature_data, page=page, x=x, y=y, width=width, height=height
+            # Le quota est rendu si la signature échoue
+            with QuotaService.consume(subscription):
+                # Signer le PDF par mise à jour incrémentale, dans le pool de processus PDF
+                with document.file.open('rb') as pdf_file:
+                    signed_pdf = pdf_pool.sign_pdf_batch(pdf_file.read(), [{
+                        'signature_data': signature_data, 'page': page,
+                        'x': x, 'y': y, 'width': width, 'height': height,
+                    }])
+                
+                # Fichier signé, statut et signature enregistrés dans une seule transaction
+                document.apply_signed_pdf(signed_pdf, request.user, certificate, [{
+                    'signature_data': signature_data, 'page': page, 'x': x, 'y': y,
+                }])
+            logger.info(f"Certificat {certificate_id} associé au document {document.id}")
+
+            return Response(
+                {"message": "Document signé avec succès", "document": DocumentSerializer(document).data},
+                status=status.HTTP_200_OK
             )
-            
-            # Mettre à jour le document avec le fichier signé
-            with open(signed_pdf_path, 'rb') as f:
-                document.file.save(f"signed_{os.path.basename(document.file.name)}", f, save=True)
-            
-            
-           
-                # Mettre à jour le statut du document
-            document.status = 'signed'
-            document.save()
-            
-            # Créer une signature avec le certificat et les coordonnées
-            signature = Signature.objects.create(
-                document=document,
-                signer=request.user,
-                certificate=certificate,
-                signature_data="Signature électronique",
-                drawn_signature=signature_data,
-                signature_position_x=x,
-                signature_position_y=y,
-                signature_page=page
+        except QuotaExceeded as e:
+            return quota_exceeded_response(e)
+        except PDFWorkerUnavailable as e:
+            return pdf_worker_error_response(e)
+        except Exception as e:
+            logger.error(f"Erreur lors de la signature du document: {str(e)}")
+            return Response(
+                {"error": f"Erreur lors de la signature du document: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
-            logger.info(f"Certificat {certificate_id} associé au document {document.id}")
+
+    @action(detail=True, methods=['post'])
+    def sign_batch(self, request, pk=None):
+        """
+        Place plusieurs signatures sur un document PDF en une seule passe
+        
+        Paramètres:
+        - placements: liste des signatures à placer, chacune avec
+          signature (base64) ou saved_signature_id, page, x, y, width, height
+        - certificate: ID du certificat à associer aux signatures
+        - async (optionnel): si vrai, le document est signé en arrière-plan et la
+          réponse 202 contient l'identifiant du travail à suivre via /api/signing-jobs/<id>/
+        """
+        document = self.get_object()
+        run_async = wants_async(request)
+        
+        placements = request.data.get('placements')
+        if not placements or not isinstance(placements, list):
+            return Response(
+                {"error": "Liste de placements manquante"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        subscription = ActiveSubscriptionResolver.for_request(request)
+        error_response = quota_error_response(subscription, len(placements))
+        if error_response:
+            return error_response
+        
+        # Vérifier que le document est un PDF
+        if not document.file.name.lower().endswith('.pdf'):
+            return Response(
+                {"error": "Le document doit être un fichier PDF"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        certificate_id = request.data.get('certificate')
+        if not certificate_id:
+            return Response(
+                {"error": "ID du certificat manquant"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            certificate = Certificate.objects.get(id=certificate_id, user=request.user, status='active')
+        except (Certificate.DoesNotExist, ValueError, DjangoValidationError):
+            return Response(
+                {"error": "Certificat introuvable ou non actif"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Valider les placements et résoudre les signatures sauvegardées
+        saved_signatures = {}
+        parsed_placements = []
+        try:
+            for placement in placements:
+                parsed = {
+                    'page': int(placement.get('page', 0)),
+                    'x': float(placement.get('x', 0)),
+                    'y': float(placement.get('y', 0)),
+                    'width': float(placement.get('width', 0)),
+                    'height': float(placement.get('height', 0)),
+                    'saved_signature_id': None,
+                }
+                if parsed['x'] < 0 or parsed['y'] < 0 or parsed['width'] <= 0 or parsed['height'] <= 0 or parsed['page'] < 0:
+                    return Response(
+                        {"error": "Coordonnées de signature invalides"},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                if not document.has_page(parsed['page']):
+                    return Response(
+                        {"error": "Numéro de page invalide"},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                
+                saved_signature_id = placement.get('saved_signature_id')
+                if saved_signature_id:
+                    if saved_signature_id not in saved_signatures:
+                        saved_signature = SavedSignature.objects.get(id=saved_signature_id, user=request.user)
+                        saved_signatures[saved_signature_id] = (saved_signature, saved_signature.decrypt_signature())
+                    saved_signature, parsed['signature_data'] = saved_signatures[saved_signature_id]
+                    parsed['saved_signature_id'] = str(saved_signature.id)
+                    parsed['image_key'] = saved_signature.image_key
+                else:
+                    parsed['signature_data'] = placement.get('signature')
+                    if not parsed['signature_data']:
+                        return Response(
+                            {"error": "Données de signature manquantes"},
+                            status=status.HTTP_400_BAD_REQUEST
+                        )
+                parsed_placements.append(parsed)
+        except (ValueError, TypeError, AttributeError) as e:
+            logger.warning(f"Erreur de conversion des placements: {str(e)}")
+            return Response(
+                {"error": "Coordonnées de signature invalides"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except (SavedSignature.DoesNotExist, DjangoValidationError):
+            return Response(
+                {"error": "Signature sauvegardée introuvable"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        if run_async:
+            return enqueue_signing_job(request, document, certificate, subscription, parsed_placements)
+        
+        try:
+            # Le quota est rendu si la signature échoue
+            with QuotaService.consume(subscription, len(parsed_placements)):
+                # Une seule passe lecture/fusion/écriture pour toutes les signatures
+                with document.file.open('rb') as pdf_file:
+                    signed_pdf = pdf_pool.sign_pdf_batch(pdf_file.read(), [
+                        {
+                            key: placement[key]
+                            for key in ('signature_data', 'page', 'x', 'y', 'width', 'height', 'image_key')
+                            if key in placement
+                        }
+                        for placement in parsed_placements
+                    ])
+                
+                document.apply_signed_pdf(signed_pdf, request.user, certificate, parsed_placements)
             
+            for saved_signature, _ in saved_signatures.values():
+                saved_signature.mark_as_used()
             
-
-
+            logger.info(f"{len(parsed_placements)} signatures placées sur le document {document.id}")
             return Response(
                 {"message": "Document signé avec succès", "document": DocumentSerializer(document).data},
                 status=status.HTTP_200_OK
             )
+        except QuotaExceeded as e:
+            return quota_exceeded_response(e)
+        except PDFWorkerUnavailable as e:
+            return pdf_worker_error_response(e)
         except Exception as e:
-            logger.error(f"Erreur lors de la signature du document: {str(e)}")
+            logger.error(f"Erreur lors de la signature groupée du document: {str(e)}")
             return Response(
                 {"error": f"Erreur lors de la signature du document: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -536,47 +848,10 @@ class DocumentViewSet(viewsets.ModelViewSet):
         """
         Retourne les statistiques de documents
         """
-        from django.db.models import Count
-        from django.db.models import Q
-        
-        # Récupérer les statistiques de documents
-        total_documents = Document.objects.count()
-        total_signatures = Signature.objects.count()
-        total_certificates = Certificate.objects.count()
-        total_pending = Document.objects.filter(status='pending').count()
-        
-        # Statistiques mensuelles (6 derniers mois)
-        from datetime import datetime, timedelta
-        import calendar
-        
-        # Obtenir la date et date actuel
-        today = datetime.now()
-        six_months_ago = today - timedelta(days=365)
-        
-        # Statistiques mensuelles des documents
-        monthly_stats = []
-        for i in range(13):
-            month_date = six_months_ago + timedelta(days=30 * i)
-            month_name = calendar.month_name[month_date.month][:3]
-            
-            # Documents créés ce mois
-            month_docs = Document.objects.filter(
-                created_at__year=month_date.year,
-                created_at__month=month_date.month
-            ).count()
-            
-            monthly_stats.append({
-                'month': month_name,
-                'count': month_docs
-            })
-        
-        stats = {
-            'total_documents': total_documents,
-            'total_signatures': total_signatures,
-            'total_certificates': total_certificates,
-            'total_pending': total_pending,
-            'monthly_stats': monthly_stats
-        }
+        if DailyUsage.is_usable():
+            stats = rollup_document_stats()
+        else:
+            stats = document_stats(Document.objects.all(), Signature.objects.all(), Certificate.objects.all())
         
         return Response(stats, status=status.HTTP_200_OK)
     
@@ -587,53 +862,14 @@ class DocumentViewSet(viewsets.ModelViewSet):
         """
         Retourne les statistiques de documents pour l'utilisateur authentifié
         """
-        from django.db.models import Count
-        from django.db.models import Q
         # user authentifié
         user = request.user
-     
-        
-        
-        
-        # Récupérer les statistiques de documents pour l'utilisateur
-        total_documents = Document.objects.filter(uploaded_by=user).count()
-        total_signatures = Signature.objects.filter(signer=user).count()
-        total_certificates = Certificate.objects.filter(user=user).count()
-        total_pending = Document.objects.filter(status='pending', uploaded_by=user).count()
-          # Statistiques mensuelles (6 derniers mois)
-        from datetime import datetime, timedelta
-        import calendar
         
-        # Obtenir la date et date actuel
-        
-        today = datetime.now()
-        
-        six_months_ago = today - timedelta(days=365)
-        
-        # Statistiques mensuelles des documents
-        monthly_stats = []
-        for i in range(13):
-            month_date = six_months_ago + timedelta(days=30 * i)
-            month_name = calendar.month_name[month_date.month][:3]
-            
-            # Documents créés ce mois
-            month_docs = Document.objects.filter(
-                uploaded_by=user,
-                created_at__year=month_date.year,
-                created_at__month=month_date.month
-            ).count()
-            
-            monthly_stats.append({
-                'month': month_name,
-                'count': month_docs
-            })
-        stats = {
-            'total_documents': total_documents,
-            'total_signatures': total_signatures,
-            'total_certificates': total_certificates,
-            'total_pending': total_pending,
-            'monthly_stats': monthly_stats
-        }
+        stats = get_user_stats(user, lambda: document_stats(
+            Document.objects.filter(uploaded_by=user),
+            Signature.objects.filter(signer=user),
+            Certificate.objects.filter(user=user),
+        ))
         
         return Response(stats, status=status.HTTP_200_OK)   
 
@@ -650,70 +886,18 @@ class DocumentViewSet(viewsets.ModelViewSet):
         - width: largeur de la signature
         - height: hauteur de la signature
         - page: numéro de page
+        - async (optionnel): si vrai, le document est signé en arrière-plan (certificate_id
+          requis) et la réponse 202 contient l'identifiant du travail à suivre via
+          /api/signing-jobs/<id>/
         """
         document = self.get_object()
     
         
-        subscription = request.user.subscriptions.filter(status='active').order_by('-created_at').first()
-        if not subscription :
-            return Response(
-                    {"error": "Vous n'avez pas d'abonnement actif"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        if subscription.signatures_used >= subscription.custom_max_signatures:
-            return Response(
-                    {"error": "Vous avez atteint votre limite de signatures pour ce mois"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        # Vérifier le quota de signatures
-        subscription_qs = request.user.subscriptions.filter(status='active').order_by('-created_at')
-
-        if subscription_qs.exists():
-            subscription = subscription_qs.first()
-
-            # Vérifier si le plan est de type "découverte"
-            if subscription.plan.plan_type != 'decouverte':
-                today = timezone.now()
-                subscription_end = subscription.current_period_end
-
-                # Vérifie si l'abonnement a expiré
-                if subscription_end <= today:
-                    return Response(
-                        {"error": "Votre abonnement a expiré."},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-
-                # Vérifie si la limite de signatures est atteinte
-                if subscription.signatures_used >= subscription.custom_max_signatures:
-                    return Response(
-                        {"error": "Vous avez atteint votre limite de signatures pour ce mois."},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-
-                # Mettre à jour le quota de signatures
-                subscription.signatures_used += 1
-                subscription.save()
-
-            else:
-                subscription = request.user.subscriptions.first()
-                today = timezone.now()  # Cela retourne déjà un datetime avec timezone UTC
-                subscription_end = subscription.current_period_end # Retirer le fuseau horaire  
-
-                if subscription_end <= today :
-                    return Response(
-                            {"error": "Vous avez atteint votre date d'abonnement est expire"},
-                            status=status.HTTP_400_BAD_REQUEST
-                        
-                        )
-                if subscription.signatures_used >= subscription.custom_max_signatures:
-                    return Response(
-                        {"error": "Vous avez atteint votre limite de signatures pour ce mois"},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                    # mettre à jour le quota de signatures
-                    # signatures_used
-                subscription.signatures_used += 1
-                subscription.save()  
+        # Vérification anticipée (sans requête) ; le quota est réservé juste avant la signature
+        subscription = ActiveSubscriptionResolver.for_request(request)
+        error_response = quota_error_response(subscription)
+        if error_response:
+            return error_response
               
         # Vérifier que le document est un PDF
         if not document.file.name.lower().endswith('.pdf'):
@@ -770,6 +954,13 @@ class DocumentViewSet(viewsets.ModelViewSet):
                     {"error": "Coordonnées de signature invalides"},
                     status=status.HTTP_400_BAD_REQUEST
                 )
+            
+            # Vérifier la page à partir de l'index de géométrie, sans relire le PDF
+            if not document.has_page(page):
+                return Response(
+                    {"error": "Numéro de page invalide"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
         except (ValueError, TypeError) as e:
             logger.warning(f"Erreur de conversion des coordonnées: {str(e)}")
             return Response(
@@ -777,47 +968,50 @@ class DocumentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        if wants_async(request):
+            # Le travail enregistré garde le certificat associé aux signatures
+            if certificate is None:
+                return Response(
+                    {"error": "ID du certificat requis pour une signature asynchrone"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            # Seul l'identifiant de la signature sauvegardée est enregistré (voir SigningJob.stored_placements)
+            return enqueue_signing_job(request, document, certificate, subscription, [{
+                'saved_signature_id': str(saved_signature.id), 'page': page,
+                'x': position_x, 'y': position_y, 'width': width, 'height': height,
+            }])
+        
         try:
-            # Récupérer les données de signature
-            signature_data = saved_signature.decrypt_signature()
+            # Le quota est rendu si la signature échoue
+            with QuotaService.consume(subscription):
+                # Récupérer les données de signature
+                signature_data = saved_signature.decrypt_signature()
+                
+                # Signer le PDF par mise à jour incrémentale, dans le pool de processus PDF
+                with document.file.open('rb') as pdf_file:
+                    signed_pdf = pdf_pool.sign_pdf_batch(pdf_file.read(), [{
+                        'signature_data': signature_data, 'page': page,
+                        'x': position_x, 'y': position_y, 'width': width, 'height': height,
+                        'image_key': saved_signature.image_key,
+                    }])
+                
+                # Fichier signé, statut et signature enregistrés dans une seule transaction
+                document.apply_signed_pdf(signed_pdf, request.user, certificate, [{
+                    'signature_data': signature_data, 'page': page,
+                    'x': position_x, 'y': position_y, 'saved_signature_id': saved_signature.id,
+                }])
             
             # Marquer la signature comme utilisée
             saved_signature.mark_as_used()
             
-            # Chemin du fichier PDF
-            pdf_path = document.file.path
-            
-            # Signer le PDF
-            signed_pdf_path = PDFSignatureManager.sign_pdf_with_base64(
-                pdf_path, signature_data, page=page, x=position_x, y=position_y, width=width, height=height
-            )
-            
-            # Mettre à jour le document avec le fichier signé
-            with open(signed_pdf_path, 'rb') as f:
-                document.file.save(f"signed_{os.path.basename(document.file.name)}", f, save=True)
-            
-            
-                # Mettre à jour le statut du document
-            document.status = 'signed'
-            document.save()
-            
-            # Créer une signature avec le certificat et les coordonnées
-            signature = Signature.objects.create(
-                document=document,
-                signer=request.user,
-                certificate=certificate,
-                signature_data="Signature électronique",
-                drawn_signature=signature_data,
-                signature_position_x=position_x,
-                signature_position_y=position_y,
-                signature_page=page,
-                saved_signature=saved_signature
-            )
-            
             return Response(
                 {"message": "Document signé avec succès", "document": DocumentSerializer(document).data},
                 status=status.HTTP_200_OK
             )
+        except QuotaExceeded as e:
+            return quota_exceeded_response(e)
+        except PDFWorkerUnavailable as e:
+            return pdf_worker_error_response(e)
         except Exception as e:
             logger.error(f"Erreur lors de la signature du document: {str(e)}")
             return Response(
@@ -828,7 +1022,8 @@ class DocumentViewSet(viewsets.ModelViewSet):
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
         # Utiliser le sérialiseur complet avec les signataires pour le détail
-        serializer = DocumentWithSignersSerializer(instance)
+        fieldset, expand = self.get_fieldset()
+        serializer = DocumentWithSignersSerializer(instance, fieldset=fieldset, expand=expand)
         return Response(serializer.data)
     
     @action(detail=True, methods=['get'])
@@ -847,30 +1042,49 @@ class DocumentViewSet(viewsets.ModelViewSet):
         serializer = DocumentSignerSerializer(signers, many=True)
         return Response(serializer.data)
 
-class DocumentSignerViewSet(viewsets.ModelViewSet):
+class SigningJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Suivi des travaux de signature asynchrones (voir DocumentViewSet.sign_batch)
+    """
+    serializer_class = SigningJobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return SigningJob.objects.filter(requested_by=self.request.user).select_related('document').order_by('-created_at')
+
+
+class DocumentSignerViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """
     Vues pour gérer les signataires d'un document
     """
     serializer_class = DocumentSignerSerializer
     permission_classes = [IsAuthenticated]
     lookup_field = 'id'
+    pagination_class = DocumentSignerCursorPagination
+    filter_backends = [DjangoFilterBackend, SearchFilter]
+    filterset_class = DocumentSignerFilter
+    search_fields = ['email', 'full_name']
     
     def get_permissions(self):
         """
         Définit les permissions en fonction de l'action
         """
-        if self.action == 'sign_pdf_with_token':
-            return []  # Pas de permission requise pour sign_pdf_with_token
+        if self.action in ('sign_pdf_with_token', 'download_with_token'):
+            return []  # Accès contrôlé par le token du signataire
         return [IsAuthenticated()]
     
     def get_queryset(self):
         # Filtrer par document si spécifié
         document_id = self.kwargs.get('document_id')
         if document_id:
-            return DocumentSigner.objects.filter(document__id=document_id)
-        
-        # Sinon, retourner tous les signataires des documents où l'utilisateur est le propriétaire
-        return DocumentSigner.objects.filter(document__uploaded_by=self.request.user)
+            queryset = DocumentSigner.objects.filter(document__id=document_id)
+        else:
+            # Sinon, retourner tous les signataires des documents où l'utilisateur est le propriétaire
+            queryset = DocumentSigner.objects.filter(document__uploaded_by=self.request.user)
+
+        if self.action in ('list', 'retrieve'):
+            queryset = DocumentSignerSerializer.setup_eager_loading(queryset)
+        return queryset
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -890,12 +1104,12 @@ class DocumentSignerViewSet(viewsets.ModelViewSet):
         
         # Vérifier le forfait pour le nombre de signataires
         try:
-            subscription = request.user.subscriptions.filter(status='active').first()
-            if subscription and subscription.plan.max_signers > 0:
+            subscription = ActiveSubscriptionResolver.for_request(request)
+            if subscription and subscription.signer_limit > 0:
                 current_signers = DocumentSigner.objects.filter(document=document).count()
-                if current_signers >= subscription.plan.max_signers:
+                if current_signers >= subscription.signer_limit:
                     return Response(
-                        {"error": f"Votre forfait permet un maximum de {subscription.plan.max_signers} signataires par document."},
+                        {"error": f"Votre forfait permet un maximum de {subscription.signer_limit} signataires par document."},
                         status=status.HTTP_400_BAD_REQUEST
                     )
         except Exception as e:
@@ -968,6 +1182,36 @@ class DocumentSignerViewSet(viewsets.ModelViewSet):
         signer.save(update_fields=['status'])
         
         return Response({"message": "Invitation annulée avec succès."}, status=status.HTTP_200_OK)
+    @action(detail=False, methods=['get'], url_path='download_with_token')
+    def download_with_token(self, request, *args, **kwargs):
+        """
+        Télécharge le document (signé ou non) pour un signataire invité
+        
+        Paramètres:
+        - token: token du signataire (paramètre de requête)
+        """
+        token = request.query_params.get('token')
+        if not token:
+            return Response(
+                {"error": "Token du signataire manquant"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            signer = DocumentSigner.objects.select_related('document').get(
+                document__id=kwargs.get('document_id'), token=token
+            )
+        except (DocumentSigner.DoesNotExist, DjangoValidationError):
+            return Response(
+                {"error": "Token de signature invalide"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        if signer.is_expired():
+            return Response(
+                {"error": "L'invitation a expiré"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return serve_document(request, signer.document, as_attachment=False)
+
     @action(detail=False, methods=['post'], url_path='sign_pdf_with_token')
     def sign_pdf_with_token(self, request, *args, **kwargs):
         """
@@ -1003,12 +1247,12 @@ class DocumentSignerViewSet(viewsets.ModelViewSet):
             # Trouver le signataire avec ce token
             signer = DocumentSigner.objects.get(document=document, token=token)
             
-            # Vérifier que le signataire est en attente
-            # if signer.status != 'pending':
-            #     return Response(
-            #         {"error": "Le signataire n'est pas en attente de signature"},
-            #         status=status.HTTP_400_BAD_REQUEST
-            #     )
+            # Vérifier que le signataire est en attente (un jeton ne sert qu'une fois)
+            if signer.status != 'pending':
+                return Response(
+                    {"error": "Le signataire n'est pas en attente de signature"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
             
             # Vérifier que l'invitation n'a pas expiré
             if signer.is_expired():
@@ -1029,6 +1273,11 @@ class DocumentSignerViewSet(viewsets.ModelViewSet):
                         {"error": "Coordonnées de signature invalides (valeurs négatives)"},
                         status=status.HTTP_400_BAD_REQUEST
                     )
+                if not document.has_page(page):
+                    return Response(
+                        {"error": "Numéro de page invalide"},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
             except (ValueError, TypeError) as e:
                 logger.warning(f"Erreur de conversion des coordonnées: {str(e)}")
                 return Response(
@@ -1043,8 +1292,32 @@ class DocumentSignerViewSet(viewsets.ModelViewSet):
             signer.notes = request.data.get('notes', '')
             signer.message = request.data.get('message', '')
             
-            # Marquer le signataire comme ayant signé
-            signer.mark_as_signed()
+            # La signature d'un invité est décomptée du quota du propriétaire du document,
+            # s'il a un abonnement actif (les invitations ont été vérifiées à leur envoi)
+            owner_subscription = ActiveSubscriptionResolver.for_user(document.uploaded_by_id)
+            if owner_subscription and not QuotaService.has_remaining(owner_subscription):
+                return Response(
+                    {"error": "Le forfait du propriétaire du document ne permet plus de signatures"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            # Marquer le signataire comme ayant signé par une mise à jour conditionnelle :
+            # un jeton rejoué (ou deux requêtes simultanées) ne signe et ne décompte qu'une fois
+            signed_at = timezone.now()
+            with transaction.atomic():
+                claimed = DocumentSigner.objects.filter(pk=signer.pk, status='pending').update(
+                    status='signed', signed_at=signed_at
+                )
+                if not claimed:
+                    return Response(
+                        {"error": "Le signataire n'est pas en attente de signature"},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                # Quota épuisé entre-temps : QuotaExceeded annule aussi le changement de statut
+                if owner_subscription and not QuotaService.reserve(owner_subscription):
+                    raise QuotaExceeded("Le forfait du propriétaire du document ne permet plus de signatures")
+            signer.status = 'signed'
+            signer.signed_at = signed_at
             
             return Response(
                 {"message": "Document signé avec succès", "document": DocumentSerializer(document).data},
@@ -1061,6 +1334,11 @@ class DocumentSignerViewSet(viewsets.ModelViewSet):
                 {"error": "Token de signature invalide"},
                 status=status.HTTP_404_NOT_FOUND
             )
+        except QuotaExceeded:
+            return Response(
+                {"error": "Le forfait du propriétaire du document ne permet plus de signatures"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         except Exception as e:
             logger.error(f"Erreur lors de la signature du document: {str(e)}")
             return Response(
@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Max, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from subscriptions.models import DailyUsage, PaymentHistory, Subscription
+from documents.models import Document, Signature
+from certificates.models import Certificate
+
+
+class Command(BaseCommand):
+    help = (
+        "Met à jour l'agrégat journalier d'utilisation (DailyUsage) depuis le dernier calcul. "
+        "À lancer régulièrement (deploy/usage-rollup.timer), avec --full de temps en temps pour rafraîchir les "
+        "documents en attente des jours plus anciens."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help="Recalcule tout l'historique")
+        parser.add_argument('--lookback-days', type=int, default=2,
+                            help='Nombre de jours déjà agrégés à recalculer (données arrivées en retard, statuts modifiés)')
+
+    def handle(self, *args, **options):
+        # Le dernier jour agrégé sert de point de reprise
+        watermark = None if options['full'] else DailyUsage.objects.aggregate(day=Max('day'))['day']
+        if watermark is None:
+            start_day = start = None
+        else:
+            start_day = watermark - timedelta(days=options['lookback_days'])
+            start = datetime(start_day.year, start_day.month, start_day.day)
+            if settings.USE_TZ:
+                start = timezone.make_aware(start)
+
+        rows = self.collect(start)
+        with transaction.atomic():
+            # Les jours recalculés sont remplacés en entier : la commande est idempotente
+            replaced = DailyUsage.objects.all() if start_day is None else DailyUsage.objects.filter(day__gte=start_day)
+            replaced.delete()
+            DailyUsage.objects.bulk_create(rows.values(), batch_size=1000)
+        DailyUsage.mark_refreshed()
+
+        since = start_day.isoformat() if start_day else "le début de l'historique"
+        self.stdout.write(self.style.SUCCESS(f"{len(rows)} ligne(s) d'utilisation calculée(s) depuis {since}"))
+
+    def collect(self, start):
+        """Construit les lignes (jour, utilisateur, plan) à partir des tables sources"""
+        rows = {}
+
+        def row(day, user_id, plan_id):
+            key = (day, user_id, plan_id)
+            if key not in rows:
+                rows[key] = DailyUsage(day=day, user_id=user_id, plan_id=plan_id)
+            return rows[key]
+
+        def since(field):
+            return {} if start is None else {f'{field}__gte': start}
+
+        documents = (
+            Document.objects.filter(**since('created_at'))
+            .annotate(day=TruncDate('created_at'))
+            .values('day', 'uploaded_by')
+            .annotate(uploaded=Count('id'), pending=Count('id', filter=Q(status='pending')))
+            .order_by()
+        )
+        signatures = (
+            Signature.objects.filter(**since('timestamp'))
+            .annotate(day=TruncDate('timestamp'))
+            .values('day', 'signer')
+            .annotate(total=Count('id'))
+            .order_by()
+        )
+        certificates = (
+            Certificate.objects.filter(**since('valid_from'))
+            .annotate(day=TruncDate('valid_from'))
+            .values('day', 'user')
+            .annotate(total=Count('id'))
+            .order_by()
+        )
+        payments = (
+            PaymentHistory.objects.filter(status='paid', **since('payment_date'))
+            .annotate(day=TruncDate('payment_date'))
+            .values('day', 'subscription__user', 'subscription__plan')
+            .annotate(total=Count('id'), amount=Sum('amount'))
+            .order_by()
+        )
+
+        # Plan du dernier abonnement de chaque utilisateur concerné, en une requête
+        user_ids = set()
+        for queryset, field in ((documents, 'uploaded_by'), (signatures, 'signer'), (certificates, 'user')):
+            user_ids.update(item[field] for item in queryset)
+        plans = dict(
+            Subscription.objects.filter(user_id__in=user_ids)
+            .order_by('user_id', 'created_at').values_list('user_id', 'plan_id')
+        )
+
+        for item in documents:
+            usage = row(item['day'], item['uploaded_by'], plans.get(item['uploaded_by']))
+            usage.documents_uploaded = item['uploaded']
+            usage.documents_pending = item['pending']
+        for item in signatures:
+            row(item['day'], item['signer'], plans.get(item['signer'])).signatures = item['total']
+        for item in certificates:
+            row(item['day'], item['user'], plans.get(item['user'])).certificates = item['total']
+        for item in payments:
+            usage = row(item['day'], item['subscription__user'], item['subscription__plan'])
+            usage.payments += item['total']
+            usage.revenue += item['amount'] or 0
+
+        return rows
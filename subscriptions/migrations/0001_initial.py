@@ -0,0 +1,89 @@
+# Generated by Django 5.0.3 on 2026-10-17 01:35
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('documents_uploaded', models.PositiveIntegerField(default=0)),
+                ('documents_pending', models.PositiveIntegerField(default=0)),
+                ('signatures', models.PositiveIntegerField(default=0)),
+                ('certificates', models.PositiveIntegerField(default=0)),
+                ('payments', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Utilisation journalière',
+                'verbose_name_plural': 'Utilisations journalières',
+            },
+        ),
+        migrations.CreateModel(
+            name='PaymentHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payment_date', models.DateTimeField(default=django.utils.timezone.now)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('status', models.CharField(choices=[('pending', 'En attente'), ('paid', 'Payé'), ('failed', 'Échoué')], default='pending', max_length=20)),
+                ('payment_method', models.CharField(choices=[('card', 'Carte bancaire'), ('mobile_money', 'Mobile Money')], default='card', max_length=50)),
+                ('stripe_invoice_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('stripe_payment_intent_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('paydunya_token', models.CharField(blank=True, max_length=100, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Plan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('plan_type', models.CharField(choices=[('decouverte', 'Découverte'), ('professionnel', 'Professionnel'), ('entreprise', 'Entreprise'), ('gouvernement', 'Gouvernement')], max_length=20)),
+                ('description', models.TextField(blank=True)),
+                ('price_monthly', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('price_annually', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('max_signatures', models.IntegerField(default=0)),
+                ('max_signers', models.IntegerField(default=1)),
+                ('storage_limit', models.IntegerField(default=100)),
+                ('retention_days', models.IntegerField(default=30)),
+                ('has_api_access', models.BooleanField(default=False)),
+                ('support_level', models.CharField(default='email', max_length=50)),
+                ('is_active', models.BooleanField(default=True)),
+                ('stripe_product_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('stripe_price_id_monthly', models.CharField(blank=True, max_length=100, null=True)),
+                ('stripe_price_id_annually', models.CharField(blank=True, max_length=100, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Subscription',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('active', 'Actif'), ('trialing', "Période d'essai"), ('past_due', 'Paiement en retard'), ('canceled', 'Annulé'), ('unpaid', 'Impayé')], default='active', max_length=20)),
+                ('billing_cycle', models.CharField(choices=[('monthly', 'Mensuel'), ('annually', 'Annuel')], default='monthly', max_length=10)),
+                ('start_date', models.DateTimeField(default=django.utils.timezone.now)),
+                ('current_period_end', models.DateTimeField(blank=True, null=True)),
+                ('canceled_at', models.DateTimeField(blank=True, null=True)),
+                ('signatures_used', models.IntegerField(default=0)),
+                ('storage_used', models.IntegerField(default=0)),
+                ('custom_max_signatures', models.IntegerField(default=5)),
+                ('custom_storage_limit', models.IntegerField(blank=True, null=True)),
+                ('stripe_customer_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('stripe_subscription_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
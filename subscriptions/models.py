@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.core.cache import cache
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth import get_user_model
 from django.utils import timezone
@@ -76,11 +77,32 @@ class Subscription(models.Model):
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Abonnement actif le plus récent : user.subscriptions.filter(status='active').order_by('-created_at')
+            models.Index(fields=['user', 'status', '-created_at'], name='subscription_user_status_idx'),
+        ]
     
+    @property
+    def signature_limit(self):
+        """Nombre maximal de signatures de la période (0 ou moins : illimité)"""
+        return self.custom_max_signatures or self.plan.max_signatures
+
+    @property
+    def signer_limit(self):
+        """Nombre maximal de signataires par document (0 ou moins : illimité)"""
+        return self.plan.max_signers
+
+    @property
+    def storage_limit(self):
+        """Espace de stockage autorisé en Mo (limite personnalisée sinon celle du plan)"""
+        return self.custom_storage_limit or self.plan.storage_limit
+
     @property
     def remaining_signatures(self):
         """Retourne le nombre de signatures restantes dans le forfait"""
-        max_signatures = self.custom_max_signatures or self.plan.max_signatures
+        max_signatures = self.signature_limit
         if max_signatures <= 0:  # Illimité
             return -1
         return max(0, max_signatures - self.signatures_used)
@@ -88,8 +110,12 @@ class Subscription(models.Model):
     @property
     def has_unlimited_signatures(self):
         """Vérifie si l'abonnement a des signatures illimitées"""
-        max_signatures = self.custom_max_signatures or self.plan.max_signatures
-        return max_signatures <= 0
+        return self.signature_limit <= 0
+
+    @property
+    def is_expired(self):
+        """La période en cours est terminée"""
+        return self.current_period_end is not None and self.current_period_end <= timezone.now()
     
     @property
     def is_active(self):
@@ -111,9 +137,9 @@ class Subscription(models.Model):
         return True
     
     def increment_signature_count(self):
-        """Incrémente le compteur de signatures"""
+        """Incrémente le compteur de signatures (sans vérifier la limite, voir QuotaService)"""
+        Subscription.objects.filter(pk=self.pk).update(signatures_used=models.F('signatures_used') + 1)
         self.signatures_used += 1
-        self.save(update_fields=['signatures_used'])
     
     def update_storage_used(self, file_size_mb):
         """Met à jour l'espace de stockage utilisé"""
@@ -156,6 +182,68 @@ class PaymentHistory(models.Model):
     paydunya_token = models.CharField(max_length=100, blank=True, null=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Paiement PayDunya en attente retrouvé par son token (webhook PayDunya)
+            models.Index(fields=['paydunya_token', 'status'], name='payment_paydunya_status_idx'),
+        ]
     
     def __str__(self):
         return f"Paiement de {self.amount} {self.get_status_display()} pour {self.subscription.user.email}"
+
+
+class DailyUsage(models.Model):
+    """
+    Agrégat journalier d'activité par utilisateur et par plan.
+
+    Alimenté par la commande refresh_usage_rollup (deploy/usage-rollup.timer) ; les
+    tableaux de bord d'administration lisent cette table au lieu de parcourir tout
+    l'historique, tant que le dernier calcul date de moins de USAGE_ROLLUP_MAX_AGE.
+    """
+    REFRESHED_AT_CACHE_KEY = 'usage_rollup_refreshed_at'
+
+    day = models.DateField()
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_usage')
+    plan = models.ForeignKey(Plan, on_delete=models.SET_NULL, null=True, blank=True, related_name='daily_usage')
+    documents_uploaded = models.PositiveIntegerField(default=0)
+    # Documents déposés ce jour-là et encore en attente lors du dernier calcul
+    documents_pending = models.PositiveIntegerField(default=0)
+    signatures = models.PositiveIntegerField(default=0)
+    certificates = models.PositiveIntegerField(default=0)
+    payments = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _('Utilisation journalière')
+        verbose_name_plural = _('Utilisations journalières')
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'user', 'plan'], name='unique_daily_usage'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='dailyusage_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"Utilisation de {self.user_id} le {self.day}"
+
+    @classmethod
+    def mark_refreshed(cls):
+        """Note la fin d'un calcul de l'agrégat (refresh_usage_rollup)"""
+        cache.set(cls.REFRESHED_AT_CACHE_KEY, timezone.now(), None)
+
+    @classmethod
+    def is_usable(cls):
+        """
+        Indique si les tableaux de bord peuvent lire l'agrégat
+
+        Faux si USAGE_ROLLUP_ENABLED est désactivé ou si l'agrégat n'a pas été
+        recalculé depuis USAGE_ROLLUP_MAX_AGE secondes : les vues comptent alors
+        directement dans les tables sources.
+        """
+        if not getattr(settings, 'USAGE_ROLLUP_ENABLED', False):
+            return False
+        refreshed_at = cache.get(cls.REFRESHED_AT_CACHE_KEY)
+        max_age = getattr(settings, 'USAGE_ROLLUP_MAX_AGE', 3600)
+        return refreshed_at is not None and timezone.now() - refreshed_at <= timezone.timedelta(seconds=max_age)
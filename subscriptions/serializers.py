@@ -1,15 +1,16 @@
 from rest_framework import serializers
 from .models import Plan, Subscription, PaymentHistory
 from django.contrib.auth import get_user_model
+from core.fieldsets import SparseFieldsetSerializerMixin
 
 User = get_user_model()
 
-class UserMinSerializer(serializers.ModelSerializer):
+class UserMinSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'email', 'username']
 
-class PlanSerializer(serializers.ModelSerializer):
+class PlanSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Plan
         fields = '__all__'
@@ -21,7 +22,7 @@ class PlanSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError("Le prix annuel ne devrait pas dépasser 12 fois le prix mensuel")
         return data
 
-class SubscriptionSerializer(serializers.ModelSerializer):
+class SubscriptionSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     plan = PlanSerializer(read_only=True)
     user = UserMinSerializer(read_only=True)
     plan_id = serializers.PrimaryKeyRelatedField(
@@ -45,6 +46,12 @@ class SubscriptionSerializer(serializers.ModelSerializer):
             'custom_storage_limit', 'signatures_used', 'storage_used',
             'remaining_signatures', 'created_at', 'updated_at'
         ]
+        fieldset_hints = {
+            'remaining_signatures': {
+                'columns': ['custom_max_signatures', 'signatures_used', 'plan', 'plan__max_signatures'],
+                'select_related': ['plan'],
+            },
+        }
     
     def validate(self, data):
         """Valider que la date de fin est après la date de début"""
@@ -55,7 +62,7 @@ class SubscriptionSerializer(serializers.ModelSerializer):
                 )
         return data
 
-class PaymentHistorySerializer(serializers.ModelSerializer):
+class PaymentHistorySerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     subscription = SubscriptionSerializer(read_only=True)
     subscription_id = serializers.PrimaryKeyRelatedField(
         queryset=Subscription.objects.all(),
@@ -93,7 +100,7 @@ class PlanUpdateSerializer(serializers.ModelSerializer):
             'stripe_price_id_annually'
         ]
 
-class SubscriptionAdminSerializer(serializers.ModelSerializer):
+class SubscriptionAdminSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Sérialiseur complet pour l'administration des abonnements"""
     plan = PlanSerializer(read_only=True)
     user = UserMinSerializer(read_only=True)
@@ -112,4 +119,10 @@ class SubscriptionAdminSerializer(serializers.ModelSerializer):
     class Meta:
         model = Subscription
         fields = '__all__'
+        fieldset_hints = {
+            'remaining_signatures': {
+                'columns': ['custom_max_signatures', 'signatures_used', 'plan', 'plan__max_signatures'],
+                'select_related': ['plan'],
+            },
+        }
         
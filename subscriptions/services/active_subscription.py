@@ -0,0 +1,69 @@
+import logging
+
+from ..models import Subscription
+
+# Configuration du logger
+logger = logging.getLogger(__name__)
+
+
+class ActiveSubscriptionResolver:
+    """
+    Abonnement actif d'un utilisateur, chargé une seule fois par requête
+
+    L'abonnement actif le plus récent est lu avec son plan (select_related) puis
+    mémorisé sur la requête : les vérifications de quota, de signataires et de
+    stockage d'une même vue ne relancent pas la requête. Les limites dérivées
+    sont exposées par le modèle (signature_limit, remaining_signatures,
+    signer_limit, storage_limit, is_expired).
+    """
+
+    REQUEST_ATTRIBUTE = '_active_subscription'
+
+    @classmethod
+    def for_user(cls, user):
+        """Abonnement actif le plus récent (utilisateur ou identifiant), avec son plan"""
+        user_id = getattr(user, 'pk', user)
+        return (
+            Subscription.objects.filter(user_id=user_id, status='active')
+            .select_related('plan')
+            .order_by('-created_at')
+            .first()
+        )
+
+    @classmethod
+    def for_request(cls, request, required=False):
+        """
+        Abonnement actif de l'utilisateur de la requête, mémorisé sur la requête
+
+        Args:
+            request: HttpRequest ou Request DRF (la valeur est partagée entre les deux)
+            required (bool): lever Subscription.DoesNotExist plutôt que renvoyer None
+
+        Returns:
+            Subscription | None
+        """
+        # Request DRF : mémoriser sur la requête Django sous-jacente
+        holder = getattr(request, '_request', request)
+        if not hasattr(holder, cls.REQUEST_ATTRIBUTE):
+            user = getattr(request, 'user', None)
+            subscription = None
+            if user is not None and user.is_authenticated:
+                subscription = cls.for_user(user)
+            setattr(holder, cls.REQUEST_ATTRIBUTE, subscription)
+
+        subscription = getattr(holder, cls.REQUEST_ATTRIBUTE)
+        if subscription is None and required:
+            raise Subscription.DoesNotExist("Aucun abonnement actif trouvé")
+        return subscription
+
+    @classmethod
+    def remember(cls, request, subscription):
+        """Remplace la valeur mémorisée (abonnement créé ou modifié pendant la requête)"""
+        setattr(getattr(request, '_request', request), cls.REQUEST_ATTRIBUTE, subscription)
+
+    @classmethod
+    def forget(cls, request):
+        """Force un nouveau chargement au prochain appel"""
+        holder = getattr(request, '_request', request)
+        if hasattr(holder, cls.REQUEST_ATTRIBUTE):
+            delattr(holder, cls.REQUEST_ATTRIBUTE)
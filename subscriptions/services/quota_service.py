@@ -0,0 +1,78 @@
+import logging
+from contextlib import contextmanager
+
+from django.db.models import F
+from ..models import Subscription
+
+# Configuration du logger
+logger = logging.getLogger(__name__)
+
+
+class QuotaExceeded(Exception):
+    """Le quota de signatures de l'abonnement ne permet pas l'opération"""
+
+
+class QuotaService:
+    """
+    Réservation atomique du quota de signatures
+
+    Le quota est pris par un seul UPDATE conditionnel :
+        UPDATE ... SET signatures_used = signatures_used + n
+        WHERE id = ... AND signatures_used + n <= limite
+    Deux signatures simultanées ne peuvent donc pas dépasser la limite, et le
+    quota est rendu (refund) si la signature échoue ensuite.
+    """
+
+    @classmethod
+    def has_remaining(cls, subscription, count=1):
+        """Vérification en mémoire, sans requête (message d'erreur anticipé)"""
+        limit = subscription.signature_limit
+        return limit <= 0 or subscription.signatures_used + count <= limit
+
+    @classmethod
+    def reserve(cls, subscription, count=1):
+        """
+        Réserve `count` signatures sur l'abonnement
+
+        Returns:
+            bool: False si la limite serait dépassée (rien n'est réservé)
+        """
+        limit = subscription.signature_limit
+        queryset = Subscription.objects.filter(pk=subscription.pk)
+        if limit > 0:
+            # La limite est lue sur l'objet chargé ; le compteur, lui, est comparé en base
+            queryset = queryset.filter(signatures_used__lte=limit - count)
+        reserved = queryset.update(signatures_used=F('signatures_used') + count) == 1
+        if reserved:
+            subscription.signatures_used += count
+        return reserved
+
+    @classmethod
+    def refund(cls, subscription, count=1):
+        """Rend `count` signatures réservées par une opération qui a échoué"""
+        subscription_id = getattr(subscription, 'pk', subscription)
+        refunded = Subscription.objects.filter(
+            pk=subscription_id, signatures_used__gte=count
+        ).update(signatures_used=F('signatures_used') - count)
+        if refunded and isinstance(subscription, Subscription):
+            subscription.signatures_used -= count
+        if not refunded:
+            logger.warning(f"Remboursement de {count} signature(s) impossible pour l'abonnement {subscription_id}")
+        return bool(refunded)
+
+    @classmethod
+    @contextmanager
+    def consume(cls, subscription, count=1):
+        """
+        Réserve le quota pour la durée du bloc et le rend si le bloc échoue
+
+        Raises:
+            QuotaExceeded: si la limite serait dépassée
+        """
+        if not cls.reserve(subscription, count):
+            raise QuotaExceeded("Vous avez atteint votre limite de signatures pour ce mois")
+        try:
+            yield subscription
+        except BaseException:
+            cls.refund(subscription, count)
+            raise
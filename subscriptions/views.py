@@ -22,13 +22,16 @@ from urllib.parse import quote
 # Configuration du logger
 logger = logging.getLogger(__name__)
 
-from .models import Plan, Subscription, PaymentHistory
+from core.stats import monthly_series
+from core.fieldsets import SparseFieldsetViewMixin
+from .models import Plan, Subscription, PaymentHistory, DailyUsage
 from .serializers import (
     PlanSerializer, SubscriptionSerializer, PaymentHistorySerializer,
     SubscriptionUpdateSerializer, PlanUpdateSerializer, SubscriptionAdminSerializer
 )
 from .stripe_service import StripeService
 from .services.paydunya_service import PayDunyaService
+from .services.active_subscription import ActiveSubscriptionResolver
 
 
 # ======= CRUD ADMIN VIEWS =======
@@ -38,7 +41,7 @@ class StandardResultsSetPagination(PageNumberPagination):
     page_size_query_param = 'page_size'
     max_page_size = 100
 
-class PlanViewSet(viewsets.ModelViewSet):
+class PlanViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """Gestion complète des plans d'abonnement pour l'administration"""
     queryset = Plan.objects.all()
     serializer_class = PlanSerializer
@@ -80,7 +83,7 @@ class PlanViewSet(viewsets.ModelViewSet):
             except Exception as e:
                 print(f"Erreur lors de la mise à jour des prix Stripe: {str(e)}")
 
-class SubscriptionAdminViewSet(viewsets.ModelViewSet):
+class SubscriptionAdminViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """Gestion complète des abonnements pour l'administration"""
     queryset = Subscription.objects.all().select_related('user', 'plan')
     serializer_class = SubscriptionAdminSerializer
@@ -119,7 +122,7 @@ class SubscriptionAdminViewSet(viewsets.ModelViewSet):
             except Exception as e:
                 print(f"Erreur lors de la création de l'abonnement Stripe: {str(e)}")
 
-class PaymentHistoryViewSet(viewsets.ModelViewSet):
+class PaymentHistoryViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """Gestion complète de l'historique des paiements pour l'administration"""
     queryset = PaymentHistory.objects.all().select_related('subscription', 'subscription__user', 'subscription__plan')
     serializer_class = PaymentHistorySerializer
@@ -152,15 +155,34 @@ class SubscriptionStatsView(APIView):
         # Répartition par cycle de facturation
         billing_cycle_counts = Subscription.objects.values('billing_cycle').annotate(count=Count('id'))
         
-        # Nombre de paiements réussis et montant total
-        payment_stats = (
-            PaymentHistory.objects
-            .filter(status='paid')
-            .aggregate(
-                total_payments=Count('id'),
-                total_amount=Sum('amount')
+        # Nombre de paiements réussis, montant total et revenus mensuels (13 derniers mois)
+        if DailyUsage.is_usable():
+            # Lus dans l'agrégat journalier (voir refresh_usage_rollup)
+            payment_stats = DailyUsage.objects.aggregate(
+                total_payments=Sum('payments'),
+                total_amount=Sum('revenue')
+            )
+            monthly_revenue = monthly_series(
+                DailyUsage.objects.all(),
+                date_field='day',
+                aggregate=Sum('revenue'),
+                key='amount',
+            )
+        else:
+            payment_stats = (
+                PaymentHistory.objects
+                .filter(status='paid')
+                .aggregate(
+                    total_payments=Count('id'),
+                    total_amount=Sum('amount')
+                )
+            )
+            monthly_revenue = monthly_series(
+                PaymentHistory.objects.filter(status='paid'),
+                date_field='payment_date',
+                aggregate=Sum('amount'),
+                key='amount',
             )
-        )
         
         # Statistiques d'utilisation globale
         usage_stats = {
@@ -184,6 +206,7 @@ class SubscriptionStatsView(APIView):
             'plan_distribution': plan_distribution,
             'billing_cycle_counts': billing_cycle_counts,
             'payment_stats': payment_stats,
+            'monthly_revenue': monthly_revenue,
             'usage_stats': usage_stats,
             'expiring_soon': expiring_soon
         })
@@ -282,17 +305,17 @@ def stripe_webhook(request):
 def usage_stats(request):
     """Statistiques d'utilisation de l'abonnement pour l'interface Web"""
     try:
-        subscription = request.user.subscription
+        subscription = ActiveSubscriptionResolver.for_request(request, required=True)
         
         context = {
             'subscription': subscription,
             'signatures_used': subscription.signatures_used,
-            'signatures_limit': subscription.plan.max_signatures,
+            'signatures_limit': subscription.signature_limit,
             'signatures_remaining': subscription.remaining_signatures,
             'storage_used': subscription.storage_used,
-            'storage_limit': subscription.plan.storage_limit,
-            'storage_percent': (subscription.storage_used / subscription.plan.storage_limit * 100) 
-                if subscription.plan.storage_limit > 0 else 0,
+            'storage_limit': subscription.storage_limit,
+            'storage_percent': (subscription.storage_used / subscription.storage_limit * 100) 
+                if subscription.storage_limit > 0 else 0,
         }
         
         return render(request, 'subscriptions/usage.html', context)
@@ -334,7 +357,7 @@ def current_subscription_api(request):
     """API pour obtenir l'abonnement actuel de l'utilisateur"""
     try:
         # Récupérer le dernier abonnement actif de l'utilisateur
-        subscription = request.user.subscriptions.filter(status='active').order_by('-created_at').first()
+        subscription = ActiveSubscriptionResolver.for_request(request)
         
         # Si l'utilisateur n'a pas d'abonnement, créer un abonnement par défaut au plan gratuit
         if not subscription:
@@ -347,6 +370,7 @@ def current_subscription_api(request):
                 current_period_end=timezone.now() + timezone.timedelta(days=30),
                 billing_cycle='monthly'
             )
+            ActiveSubscriptionResolver.remember(request, subscription)
         
         # Construire la réponse
         response_data = {
@@ -430,7 +454,7 @@ def change_plan_api(request, plan_id):
     # Si le plan est gratuit, passer directement au forfait gratuit
     if plan.plan_type == 'decouverte':
         try:
-            subscription = request.user.subscriptions
+            subscription = ActiveSubscriptionResolver.for_request(request, required=True)
             
             # Si l'utilisateur a un abonnement payant, l'annuler d'abord
             if subscription.plan.price_monthly > 0 and subscription.stripe_subscription_id:
@@ -468,7 +492,7 @@ def change_plan_api(request, plan_id):
     try:
         # Vérifier si l'utilisateur a déjà un abonnement
         try:
-            subscription = request.user.subscriptions
+            subscription = ActiveSubscriptionResolver.for_request(request, required=True)
             
             # Créer la session de paiement pour la mise à jour
             checkout_result = StripeService.create_checkout_session(
@@ -512,7 +536,7 @@ def change_plan_api(request, plan_id):
 def cancel_subscription_api(request):
     """API pour annuler un abonnement"""
     try:
-        subscription = request.user.subscription
+        subscription = ActiveSubscriptionResolver.for_request(request, required=True)
         StripeService.cancel_subscription(subscription)
         
         return Response({
@@ -536,16 +560,16 @@ def cancel_subscription_api(request):
 def usage_stats_api(request):
     """API pour obtenir les statistiques d'utilisation"""
     try:
-        subscription = request.user.subscriptions.filter(status='active').order_by('-created_at').first()
+        subscription = ActiveSubscriptionResolver.for_request(request, required=True)
         
         response_data = {
             'signatures_used': subscription.signatures_used,
-            'signatures_limit': subscription.plan.max_signatures,
+            'signatures_limit': subscription.signature_limit,
             'signatures_remaining': subscription.remaining_signatures,
             'storage_used': subscription.storage_used,
-            'storage_limit': subscription.plan.storage_limit,
-            'storage_percent': (subscription.storage_used / subscription.plan.storage_limit * 100)
-            if subscription.plan.storage_limit > 0 else 0,
+            'storage_limit': subscription.storage_limit,
+            'storage_percent': (subscription.storage_used / subscription.storage_limit * 100)
+            if subscription.storage_limit > 0 else 0,
         }
         
         return Response(response_data)
@@ -21,11 +21,12 @@ from django.utils.http import urlsafe_base64_encode
 from django.utils.translation import gettext as _
 
 
+from core.fieldsets import SparseFieldsetSerializerMixin
 from .utils import send_mail
 
 logger = logging.getLogger(__name__)
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = '__all__'
@@ -35,6 +36,12 @@ class UserSerializer(serializers.ModelSerializer):
         user = User.objects.create_user(**validated_data)
         return user
 
+class UserSummarySerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    """Représentation compacte d'un utilisateur (listes)"""
+    class Meta:
+        model = User
+        fields = ['id', 'email', 'first_name', 'last_name']
+
 # login
 class LoginView(TokenObtainPairView):
     serializer_class = TokenObtainPairSerializer